@@ -0,0 +1,72 @@
+"""
+Compare le filtrage de l'Explorer par parcours des colonnes et par index.
+
+Usage: python benchmarks/filter_indexes.py --rows 10000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+from catalog import build_catalog, datetime_column  # noqa: E402
+from filters import _compute_mask, _indexed_mask  # noqa: E402
+from indexes import build_index, index_kind  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+
+def timed(func, repeat):
+    """Meilleur temps d'exécution sur `repeat` essais"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Ventes de 2023 et 2024, couvertes par le filtre de dates ci-dessous
+    df = generate(args.rows, end_date=date(2024, 12, 31))
+    catalog = build_catalog(df)
+
+    predicates = [
+        ("isin", "category", ("Books", "Toys")),
+        ("isin", "month", (1, 2, 3)),
+        ("range", "price", (10.0, 50.0)),
+        ("range", "price", (100.0, 120.0)),
+        ("date_range", "date", (pd.Timestamp("2023-06-01").date(), pd.Timestamp("2023-08-31").date())),
+    ]
+
+    print(f"{'prédicat':<30}{'parcours (ms)':>15}{'index (ms)':>15}{'gain':>8}{'constr. (ms)':>15}")
+    for kind, column, value in predicates:
+        series = datetime_column(catalog, df, column)
+        scan_time, scan_mask = timed(lambda: _compute_mask(series, kind, value), args.repeat)
+        # Index construit à la demande, comme au premier prédicat actif sur la colonne
+        build_time, index = timed(lambda: build_index(series, index_kind(kind)), 1)
+        if index is None:
+            print(f"{kind + ' ' + column:<30}{scan_time * 1000:>15.1f}{'-':>15}")
+            continue
+        index_time, index_mask = timed(
+            lambda: _indexed_mask(index, len(df), kind, value), args.repeat
+        )
+        if index_mask is None:
+            print(f"{kind + ' ' + column:<30}{scan_time * 1000:>15.1f}{'parcours':>15}")
+            continue
+        assert np.array_equal(scan_mask, index_mask), f"Résultats différents pour {column}"
+        print(f"{kind + ' ' + column:<30}{scan_time * 1000:>15.1f}{index_time * 1000:>15.1f}"
+              f"{scan_time / index_time:>7.1f}x{build_time * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
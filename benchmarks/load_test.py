@@ -0,0 +1,275 @@
+"""
+Test de charge: sessions simultanées simulées sur les vraies pages, sans navigateur.
+
+Chaque session (un thread, un AppTest) charge un fichier CSV du dossier data/ depuis
+la sidebar de l'accueil, modifie les filtres de l'Explorer puis change de type de
+graphique dans le Visualiser. Le fichier, écrit dans data/ pour la durée du test,
+apparaît aussi dans la liste des fichiers locaux des autres sessions de l'application.
+Pour chaque niveau de concurrence et chaque taille de données, le script affiche
+les durées des reruns (p50/p95/p99), l'attente avant chaque rerun, le débit en reruns
+par seconde et la mémoire résidente (RSS) du processus, qui héberge toutes les sessions
+comme le serveur.
+
+AppTest modifie l'état global de Streamlit pendant un rerun: les reruns des sessions
+sont donc exécutés l'un après l'autre, comme par un serveur saturé à un seul cœur.
+La durée d'un rerun est mesurée sans l'attente des autres sessions, relevée à part;
+le registre des jeux de données et les caches restent partagés entre les sessions,
+comme sur le serveur.
+
+Le script se termine en erreur (code 1) si une session a rencontré une erreur.
+
+Usage: python benchmarks/load_test.py --sessions 1,4,16 --rows 10000,1000000
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Caches disque isolés, pas d'export de métriques pendant le test
+WORK_DIR = tempfile.mkdtemp(prefix="load-test-")
+os.environ["DATASET_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["DATASET_SPILL_DIR"] = os.path.join(WORK_DIR, "spill")
+os.environ["TRACING_METRICS_FILE"] = ""
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app")
+sys.path.insert(0, APP_DIR)
+
+import dataset_store  # noqa: E402
+import streamlit as st  # noqa: E402
+from catalog import get_catalog  # noqa: E402
+from data_loader import DATA_DIR  # noqa: E402
+from dataset_store import SESSION_KEY  # noqa: E402
+from streamlit import logger  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from summaries import get_summary  # noqa: E402
+from synthetic import CATEGORIES, generate  # noqa: E402
+
+# Avertissements de Streamlit hors serveur (pas de runtime, pas de contexte de script) masqués
+logger.set_log_level("error")
+
+HOME = os.path.join(APP_DIR, "Home.py")
+EXPLORER = "pages/01_Explorer.py"
+VISUALISER = "pages/02_Visualiser.py"
+CHART_TYPES = ["Barres", "Ligne", "Dispersion", "Histogramme"]
+
+# Délai maximal d'un rerun et du chargement d'un fichier, en secondes
+RUN_TIMEOUT = 300
+# Intervalle entre deux relevés de la mémoire résidente, en secondes
+RSS_INTERVAL = 0.2
+# Date de fin fixe: le jeu de données est identique d'une exécution à l'autre
+END_DATE = date(2024, 12, 31)
+
+# Un seul rerun AppTest à la fois dans le processus (voir plus haut)
+_run_lock = threading.Lock()
+
+
+def current_rss():
+    """Mémoire résidente du processus en octets (Linux), sinon le pic depuis le démarrage"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssMonitor(threading.Thread):
+    """Relève la mémoire résidente pendant le test et garde le maximum"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = current_rss()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class Session:
+    """Une session simulée: ses latences de rerun par page et ses erreurs"""
+
+    def __init__(self, index, file_name, interactions):
+        self.index = index
+        self.file_name = file_name
+        self.interactions = interactions
+        self.rng = np.random.default_rng(index)
+        self.latencies = {"Home": [], "Explorer": [], "Visualiser": []}
+        self.waits = []
+        self.ingest_seconds = None
+        self.errors = []
+
+    def _run(self, at, page, action=None):
+        """Rerun chronométré de la page (après une interaction éventuelle), attente relevée à part"""
+        start = time.perf_counter()
+        with _run_lock:
+            run_start = time.perf_counter()
+            (action or at).run()
+            end = time.perf_counter()
+        self.waits.append(run_start - start)
+        self.latencies[page].append(end - run_start)
+        if at.exception:
+            self.errors.append(f"{page}: {at.exception[0].message}")
+        return end - run_start
+
+    def scenario(self):
+        at = AppTest.from_file(HOME, default_timeout=RUN_TIMEOUT)
+        self._run(at, "Home")
+
+        # Chargement du fichier de data/ choisi dans la sidebar
+        self._run(at, "Home", at.selectbox(key="local_file").set_value(self.file_name))
+        load = next(button for button in at.button if button.label == "Charger ce fichier")
+        self.ingest_seconds = self._run(at, "Home", load.click())
+        if SESSION_KEY not in at.session_state:
+            raise RuntimeError("jeu de données non chargé")
+
+        at.switch_page(EXPLORER)
+        self._run(at, "Explorer")
+        for _ in range(self.interactions):
+            widget, value = self._filter_change(at)
+            self._run(at, "Explorer", widget.set_value(value))
+
+        at.switch_page(VISUALISER)
+        self._run(at, "Visualiser")
+        for i in range(self.interactions):
+            chart_type = next(box for box in at.selectbox if box.label == "Type de graphique")
+            self._run(at, "Visualiser", chart_type.set_value(CHART_TYPES[(i + 1) % len(CHART_TYPES)]))
+
+    def _filter_change(self, at):
+        """Modification aléatoire d'un filtre de l'Explorer"""
+        choice = self.rng.integers(3)
+        if choice == 0:
+            size = int(self.rng.integers(1, len(CATEGORIES) + 1))
+            return at.multiselect(key="filter_category"), list(self.rng.choice(CATEGORIES, size, replace=False))
+        if choice == 1:
+            slider = at.slider(key="slider_price")
+            low, high = slider.min, slider.max
+            bounds = np.sort(self.rng.uniform(low, high, 2))
+            return slider, (float(bounds[0]), float(bounds[1]))
+        months = self.rng.choice(np.arange(1, 13), int(self.rng.integers(1, 13)), replace=False)
+        return at.multiselect(key="month_filter"), sorted(int(month) for month in months)
+
+    def __call__(self):
+        try:
+            self.scenario()
+        except Exception as e:  # Une session en échec ne doit pas interrompre le test
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+
+def _reset_caches():
+    """Repart de caches vides entre deux configurations"""
+    st.cache_data.clear()
+    for cached in (get_catalog, get_summary):
+        cached.clear()
+    dataset_store.clear_derived()
+    shutil.rmtree(os.environ["DATASET_CACHE_DIR"], ignore_errors=True)
+    gc.collect()
+
+
+def _write_csv(n_rows):
+    """Écrit le jeu de données du test dans data/ et retourne le nom du fichier"""
+    name = f"load-test-{os.getpid()}-{n_rows}.csv"
+    table = pa.Table.from_pandas(generate(n_rows, end_date=END_DATE), preserve_index=False)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    pa_csv.write_csv(table, os.path.join(DATA_DIR, name))
+    return name
+
+
+def run_load(n_sessions, file_name, interactions):
+    """Lance `n_sessions` sessions simultanées et retourne leurs mesures agrégées"""
+    _reset_caches()
+    sessions = [Session(i, file_name, interactions) for i in range(n_sessions)]
+    threads = [threading.Thread(target=session) for session in sessions]
+
+    monitor = RssMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+
+    latencies = np.array([
+        latency for session in sessions for page in session.latencies.values() for latency in page
+    ])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    waits = [wait for session in sessions for wait in session.waits]
+    wait_p50, wait_p95 = np.percentile(waits, [50, 95]) if waits else (np.nan,) * 2
+    by_page = {
+        page: float(np.percentile([x for s in sessions for x in s.latencies[page]], 95))
+        for page in sessions[0].latencies
+        if any(s.latencies[page] for s in sessions)
+    }
+    return {
+        "sessions": n_sessions,
+        "reruns": int(len(latencies)),
+        "p50_ms": round(float(p50) * 1000, 1),
+        "p95_ms": round(float(p95) * 1000, 1),
+        "p99_ms": round(float(p99) * 1000, 1),
+        "p95_by_page_ms": {page: round(value * 1000, 1) for page, value in by_page.items()},
+        "wait_p50_ms": round(float(wait_p50) * 1000, 1),
+        "wait_p95_ms": round(float(wait_p95) * 1000, 1),
+        "ingest_max_s": round(max(s.ingest_seconds or 0 for s in sessions), 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "peak_rss_mb": round(monitor.peak / 1024**2, 1),
+        "errors": [error for s in sessions for error in s.errors],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,4,16", help="Niveaux de concurrence séparés par des virgules")
+    parser.add_argument("--rows", default="10000,1000000", help="Tailles de données séparées par des virgules")
+    parser.add_argument("--interactions", type=int, default=10, help="Interactions par page et par session")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'lignes':>10}{'sessions':>10}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'att. p50':>10}{'att. p95':>10}{'reruns/s':>10}{'RSS Mo':>10}")
+    try:
+        for n_rows in (int(size) for size in args.rows.split(",")):
+            file_name = _write_csv(n_rows)
+            try:
+                for n_sessions in (int(level) for level in args.sessions.split(",")):
+                    result = {"rows": n_rows, **run_load(n_sessions, file_name, args.interactions)}
+                    results.append(result)
+                    print(f"{n_rows:>10,}{n_sessions:>10}{result['reruns']:>8}{result['p50_ms']:>10.1f}"
+                          f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                          f"{result['wait_p50_ms']:>10.1f}{result['wait_p95_ms']:>10.1f}"
+                          f"{result['throughput_rps']:>10.2f}{result['peak_rss_mb']:>10.1f}")
+                    for error in result["errors"][:5]:
+                        print(f"  erreur: {error}")
+            finally:
+                os.remove(os.path.join(DATA_DIR, file_name))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if any(result["errors"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Mesure les chemins de l'application (chargement, normalisation, filtres, graphiques) sans navigateur.
+
+Chaque cas est exécuté sur le jeu de données synthétique (synthetic.py) à plusieurs
+tailles, caches vidés entre deux essais. Le temps (meilleur essai) et le pic mémoire
+(allocations suivies par tracemalloc: Python, NumPy et pandas) sont comparés à une
+référence JSON: le script échoue si un cas régresse au-delà du seuil.
+
+Usage: python benchmarks/suite.py --sizes 10000,1000000,10000000
+       python benchmarks/suite.py --update-baseline
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Caches disque des chargements isolés dans un dossier temporaire
+WORK_DIR = tempfile.mkdtemp(prefix="benchmarks-")
+os.environ["DATASET_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+os.environ["DATASET_SPILL_DIR"] = os.path.join(WORK_DIR, "spill")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+import dataset_store  # noqa: E402
+import streamlit as st  # noqa: E402
+from aggregations import group_aggregate, histogram  # noqa: E402
+from catalog import build_catalog, get_catalog  # noqa: E402
+from data_loader import DATASET_ID_ATTR, load_data, normalize_dtypes, optimize_dtypes  # noqa: E402
+from filters import apply_filters  # noqa: E402
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec  # noqa: E402
+from summaries import get_summary  # noqa: E402
+from synthetic import generate  # noqa: E402
+from utils import prepare_dataframe_for_display  # noqa: E402
+from visualizations import clean_dataframe_for_plotly, line_figure, scatter_figure  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Régression tolérée par rapport à la référence (0.25 = 25 %)
+DEFAULT_THRESHOLD = 0.25
+# Écarts absolus en dessous desquels une hausse relève du bruit de mesure
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 1.0
+# Les classeurs Excel sont limités à 1 048 576 lignes et lents à écrire: au-delà, le cas est ignoré
+XLSX_MAX_ROWS = 100_000
+# Date de fin fixe: le jeu de données est identique d'une exécution à l'autre
+END_DATE = date(2024, 12, 31)
+
+FILTER_PREDICATES = [
+    ("isin", "category", ("Books", "Toys")),
+    ("range", "price", (10.0, 50.0)),
+    ("isin", "month", (1, 2, 3)),
+    ("date_range", "date", (date(2023, 6, 1), date(2024, 6, 30))),
+]
+
+
+def _upload(data, name):
+    """Fichier chargé tel que Streamlit le transmet à l'application"""
+    return UploadedFile(UploadedFileRec(file_id=name, name=name, type="", data=data), None)
+
+
+def _csv_bytes(df):
+    sink = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), sink)
+    return sink.getvalue()
+
+
+def _xlsx_bytes(df):
+    sink = io.BytesIO()
+    df.to_excel(sink, index=False)
+    return sink.getvalue()
+
+
+def _load(file):
+    """Chargement complet d'un fichier (lecture, normalisation, résumés), comme en arrière-plan"""
+    handle = load_data(file, progress=lambda fraction, chunk: None)
+    df = dataset_store.get(handle)
+    handle.close()
+    return df
+
+
+def _reset_caches():
+    """
+    Vide les caches des jeux de données et le cache disque: chaque essai part à froid.
+    Les ressources partagées (pool de processus Excel, registre) sont conservées,
+    comme dans un serveur déjà démarré.
+    """
+    st.cache_data.clear()
+    for cached in (get_catalog, get_summary):
+        cached.clear()
+    dataset_store.clear_derived()
+    shutil.rmtree(os.environ["DATASET_CACHE_DIR"], ignore_errors=True)
+
+
+def make_cases(n_rows):
+    """Cas mesurés pour une taille: liste de (nom, fonction sans argument)"""
+    raw = generate(n_rows, end_date=END_DATE)
+    df = optimize_dtypes(normalize_dtypes(raw.copy()))
+    df.attrs[DATASET_ID_ATTR] = f"benchmark:{n_rows}"
+    catalog = build_catalog(df)
+    csv_file = _upload(_csv_bytes(raw), "ventes.csv")
+
+    cases = [
+        ("load_data[csv]", lambda: _load(csv_file)),
+    ]
+    if n_rows <= XLSX_MAX_ROWS:
+        xlsx_file = _upload(_xlsx_bytes(raw), "ventes.xlsx")
+        cases.append(("load_data[xlsx]", lambda: _load(xlsx_file)))
+
+    cases += [
+        # Données non normalisées au chargement: copie et conversion complètes
+        ("prepare_dataframe_for_display", lambda: prepare_dataframe_for_display(raw)),
+        ("clean_dataframe_for_plotly", lambda: clean_dataframe_for_plotly(raw)),
+        ("build_catalog", lambda: build_catalog(df)),
+        # Premier filtrage d'un jeu de données: index et masques construits à froid
+        ("apply_filters", lambda: apply_filters(df, catalog, FILTER_PREDICATES)),
+        ("line_figure", lambda: line_figure(np.arange(len(df)), df["total_sales"], "", "", "")),
+        ("scatter_figure", lambda: scatter_figure(df["price"], df["total_sales"], "", "", "")),
+        ("histogram", lambda: histogram(df["price"], "auto")),
+        ("group_aggregate", lambda: group_aggregate(df["category"], df["total_sales"], "sum")),
+    ]
+    return cases
+
+
+def measure(func, repeat):
+    """Meilleur temps sur `repeat` essais, puis pic mémoire d'un essai suivi par tracemalloc"""
+    best = float("inf")
+    for _ in range(repeat):
+        _reset_caches()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    # Mesure mémoire séparée: tracemalloc ralentit l'exécution
+    _reset_caches()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak / 1024**2, 2)}
+
+
+def regressions(results, baseline, threshold):
+    """Liste des mesures qui dépassent la référence de plus de `threshold`"""
+    found = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+            if result[metric] - reference[metric] < floor:
+                continue
+            if result[metric] > reference[metric] * (1 + threshold):
+                found.append(f"{key} {metric}: {reference[metric]} -> {result[metric]}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,1000000", help="Tailles séparées par des virgules")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--update-baseline", action="store_true", help="Enregistre les mesures comme référence")
+    args = parser.parse_args()
+
+    results = {}
+    try:
+        for n_rows in (int(size) for size in args.sizes.split(",")):
+            for name, func in make_cases(n_rows):
+                key = f"{name}@{n_rows}"
+                results[key] = measure(func, args.repeat)
+                print(f"{key:<45}{results[key]['seconds'] * 1000:>12.1f} ms{results[key]['peak_mb']:>12.1f} Mo")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform()},
+                "results": {**baseline, **results},
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Référence enregistrée: {args.baseline}")
+        return
+
+    found = regressions(results, baseline, args.threshold)
+    if found:
+        print(f"Régressions au-delà de {args.threshold:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import streamlit as st
-import pandas as pd
 import os
+from datetime import date
 
 # Configuration de la page - DOIT ÊTRE EN PREMIER
 st.set_page_config(
@@ -10,102 +10,152 @@ st.set_page_config(
 )
 
 # Imports après la configuration
-from data_loader import load_data
+from data_loader import DATA_DIR, DATASET_ID_ATTR, list_data_files, load_local_data, load_local_preview, normalize_dtypes, optimize_dtypes, upload_source
+from dataset_cache import cache_stats
+from dataset_store import acquire, clear_session_dataset, session_dataset, session_handle, set_session_dataset, store_stats
+from excel import sheet_names
+from ingestion import cancel_ingestion, current_job, ingestion_preview, ingestion_status, start_ingestion
+from query import duckdb_available
+from static_assets import load_css
+from synthetic import MAX_ROWS, MIN_ROWS, generate, write_parquet
+from tracing import debug_panel, start_rerun
 from visualizations import plot_simple_chart
-from utils import prepare_dataframe_for_display, add_logo
+from utils import prepare_dataframe_for_display
 
-# Chargement des CSS
-def load_css():
-    import os
-    css_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "css", "style.css")
-    try:
-        with open(css_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    except FileNotFoundError:
-        pass  # CSS optionnel
+start_rerun("Home")
 
+# Feuille de style et logo (construits une fois par processus)
 load_css()
-add_logo()
 
 # Sidebar avec chargement de données pour Home uniquement
 with st.sidebar:
     # Chargement de données
-    uploaded_file = st.file_uploader("Charger des données", type=["csv", "xlsx"])
+    uploaded_file = st.file_uploader(
+        "Charger des données",
+        type=["csv", "xlsx", "parquet", "feather", "arrow"]
+    )
+    
+    # Fichiers déjà présents dans data/ (fichiers colonnes ouverts en mémoire mappée)
+    local_file = None
+    local_files = list_data_files()
+    if not uploaded_file and local_files:
+        local_file = st.selectbox(
+            "Ou choisir un fichier du dossier data/",
+            local_files,
+            index=None,
+            placeholder="Aucun fichier",
+            key="local_file"
+        )
+    
+    # Les données sont partagées entre les sessions: la session ne garde qu'un handle
+    handle = session_handle()
+    
+    if uploaded_file:
+        # Classeur Excel: choix de la feuille (chaque feuille est mise en cache séparément)
+        sheet = None
+        readable = True
+        if uploaded_file.name.lower().endswith(".xlsx"):
+            try:
+                sheets = sheet_names(uploaded_file.file_id, uploaded_file)
+            except Exception as e:
+                # Classeur illisible (fichier corrompu ou qui n'est pas un .xlsx): rien à charger
+                st.error(f"Erreur: {e}")
+                readable = False
+            else:
+                sheet = st.selectbox("Feuille", sheets) if len(sheets) > 1 else sheets[0]
+        source = upload_source(uploaded_file, sheet)
+        
+        # Le fichier n'est relu que s'il a changé depuis le dernier chargement,
+        # dans un thread de chargement: la page et les autres pages restent utilisables
+        job = current_job()
+        if readable and (handle is None or handle.source != source):
+            if job is None or job["source"] != source:
+                start_ingestion(uploaded_file, sheet)
+    elif current_job() is not None:
+        # Fichier retiré: le chargement en cours est abandonné
+        cancel_ingestion()
+    
+    loading = ingestion_status()
     
     if uploaded_file:
-        df = load_data(uploaded_file)
-        st.session_state["data"] = df
-        st.success(f"Données chargées: {df.shape[0]} lignes")
+        if handle is not None and handle.source == source:
+            st.success(f"Données chargées: {len(session_dataset())} lignes")
+            stats = cache_stats()
+            st.caption(f"Cache disque: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} fichiers")
+    elif local_file:
+        if st.button("Charger ce fichier"):
+            handle = load_local_data(os.path.join(DATA_DIR, local_file))
+            if handle is not None:
+                set_session_dataset(handle)
+                st.success(f"Données chargées: {len(session_dataset())} lignes")
+        if duckdb_available() and st.button("Explorer avec DuckDB (sans chargement)"):
+            # Le fichier reste sur disque: l'Explorer l'interroge en SQL
+            clear_session_dataset()
+            handle = None
+            st.session_state["data_path"] = os.path.join(DATA_DIR, local_file)
+            st.success("Fichier ouvert avec DuckDB, disponible dans l'Explorer")
     else:
-        # Exemple de données
+        # Exemple de données, généré par blocs (synthetic.py)
+        n_samples = st.number_input(
+            "Nombre de lignes",
+            min_value=MIN_ROWS,
+            max_value=MAX_ROWS,
+            value=MIN_ROWS,
+            step=MIN_ROWS,
+            key="sample_rows"
+        )
         if st.button("Charger données d'exemple"):
-            import numpy as np
-            from datetime import datetime, timedelta
-            
-            # Créer un dataset de ventes e-commerce réaliste
-            np.random.seed(42)
-            n_samples = 1000
-            
-            # Générer des dates sur les 2 dernières années
-            start_date = datetime.now() - timedelta(days=730)
-            dates = [start_date + timedelta(days=int(i)) for i in np.random.randint(0, 730, n_samples)]
-            
-            # Catégories de produits
-            categories = ["Electronics", "Fashion", "Home", "Sports", "Books", "Beauty", "Toys"]
-            category_weights = [0.25, 0.20, 0.15, 0.12, 0.10, 0.10, 0.08]
-            
-            # Régions
-            regions = ["North America", "Europe", "Asia", "South America", "Africa", "Oceania"]
-            region_weights = [0.35, 0.25, 0.20, 0.10, 0.06, 0.04]
+            # Même graine, même taille et même jour: toutes les sessions partagent le même jeu d'exemple
+            sample_key = f"exemple:{n_samples}:{date.today()}"
             
-            # Générer les données
-            df = pd.DataFrame({
-                "date": dates,
-                "category": np.random.choice(categories, n_samples, p=category_weights),
-                "region": np.random.choice(regions, n_samples, p=region_weights),
-                "price": np.random.lognormal(3, 0.8, n_samples).round(2),
-                "quantity": np.random.poisson(2, n_samples) + 1,
-                "customer_age": np.random.normal(35, 12, n_samples).astype(int).clip(18, 80),
-                "discount_rate": np.random.beta(2, 8, n_samples).round(3),
-                "shipping_cost": np.random.gamma(2, 5, n_samples).round(2),
-                "customer_satisfaction": np.random.normal(4.2, 0.6, n_samples).round(1).clip(1, 5),
-                "is_premium": np.random.choice([True, False], n_samples, p=[0.3, 0.7])
-            })
+            def load_sample():
+                with st.spinner("Génération des données..."):
+                    df = optimize_dtypes(normalize_dtypes(generate(n_samples)))
+                df.attrs[DATASET_ID_ATTR] = sample_key
+                return df
             
-            # Calculer le total des ventes
-            df["total_sales"] = (df["price"] * df["quantity"] * (1 - df["discount_rate"])).round(2)
-            
-            # Ajouter des variations saisonnières
-            df["month"] = pd.to_datetime(df["date"]).dt.month
-            df["is_weekend"] = pd.to_datetime(df["date"]).dt.dayofweek >= 5
-            
-            # Convertir les types
-            df = df.astype({
-                "category": "str",
-                "region": "str", 
-                "price": "float64",
-                "quantity": "int64",
-                "customer_age": "int64",
-                "discount_rate": "float64",
-                "shipping_cost": "float64",
-                "customer_satisfaction": "float64",
-                "total_sales": "float64",
-                "month": "int64",
-                "is_premium": "bool",
-                "is_weekend": "bool"
-            })
-            
-            st.session_state["data"] = df
-            st.success(f"Données d'exemple chargées! {len(df)} transactions e-commerce")
+            handle = acquire(sample_key, load_sample, source="exemple")
+            set_session_dataset(handle)
+            st.success(f"Données d'exemple chargées! {n_samples:,} transactions e-commerce")
+        
+        if st.button("Écrire l'exemple en Parquet dans data/"):
+            # Le fichier écrit est sélectionné dans la liste des fichiers locaux:
+            # il s'ouvre en mémoire mappée ou avec DuckDB
+            name = f"exemple_{n_samples}.parquet"
+            with st.spinner("Écriture du fichier Parquet..."):
+                write_parquet(os.path.join(DATA_DIR, name), n_samples)
+            st.session_state["local_file"] = name
+            st.rerun()
+    
+    stats = store_stats()
+    if stats["datasets"]:
+        st.caption(
+            f"Mémoire partagée: {stats['datasets']} jeu(x) de données, "
+            f"{stats['bytes'] / 1024**2:.1f} Mo en mémoire, "
+            f"{stats['derived_bytes'] / 1024**2:.1f} Mo de masques, index et ordres de tri, "
+            f"{stats['spilled_bytes'] / 1024**2:.1f} Mo déchargés sur disque, "
+            f"{stats['references']} session(s)"
+        )
 
 # Corps principal
 st.markdown("""
 <h1><span>Bienvenue dans Streamlit App Template</span></h1>
 """, unsafe_allow_html=True)
 
+# Aperçu du fichier en cours de chargement, dès que le premier bloc est lu
+if loading:
+    st.subheader("Aperçu des données")
+    ingestion_preview()
+
+# Aperçu d'un fichier local: seuls les premiers row groups sont lus
+elif local_file and (handle is None or handle.source != local_file):
+    st.subheader("Aperçu des données")
+    st.dataframe(prepare_dataframe_for_display(load_local_preview(os.path.join(DATA_DIR, local_file))))
+    st.info("👈 Cliquez sur « Charger ce fichier » pour explorer le jeu de données complet")
+
 # Vérifier si des données sont chargées
-if "data" in st.session_state:
-    df = st.session_state["data"]
+elif handle is not None:
+    df = session_dataset()
     
     # Afficher aperçu des données
     st.subheader("Aperçu des données")
@@ -116,3 +166,5 @@ if "data" in st.session_state:
     plot_simple_chart(df)
 else:
     st.info("👈 Veuillez charger des données via la barre latérale pour commencer")
+
+debug_panel()
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Règles de calcul du nombre de classes d'un histogramme (voir numpy.histogram_bin_edges)
+HISTOGRAM_BIN_RULES = {
+    "Automatique": "auto",
+    "Freedman-Diaconis": "fd",
+    "Sturges": "sturges",
+    "Scott": "scott",
+    "Rice": "rice",
+    "Racine carrée": "sqrt",
+}
+# Nombre maximal de classes envoyées au navigateur
+MAX_HISTOGRAM_BINS = 500
+
+# Fonctions d'agrégation des graphiques en barres
+AGGREGATIONS = {
+    "Somme": "sum",
+    "Moyenne": "mean",
+    "Nombre": "count",
+}
+
+# Regroupement des dates par période
+TIME_BUCKETS = {
+    "Jour": "D",
+    "Semaine": "W",
+    "Mois": "M",
+    "Trimestre": "Q",
+    "Année": "Y",
+}
+
+
+def _finite_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+def _bin_width(values, rule):
+    """Largeur des classes selon la règle, avec les formules de numpy.histogram_bin_edges"""
+    n = len(values)
+    sturges = np.ptp(values) / (np.log2(n) + 1.0)
+    if rule == "sturges":
+        return sturges
+    if rule == "sqrt":
+        return np.ptp(values) / np.sqrt(n)
+    if rule == "rice":
+        return np.ptp(values) / (2.0 * n ** (1 / 3))
+    if rule == "scott":
+        return (24.0 * np.pi ** 0.5 / n) ** (1 / 3) * np.std(values)
+    q75, q25 = np.percentile(values, [75, 25])
+    fd = 2.0 * (q75 - q25) * n ** (-1 / 3)
+    if rule == "fd":
+        return fd
+    if rule == "auto":
+        return min(fd, sturges) if fd else sturges
+    raise ValueError(f"Règle de classes inconnue: {rule}")
+
+
+def histogram(values, rule="auto", max_bins=MAX_HISTOGRAM_BINS):
+    """
+    Calcule un histogramme côté serveur: retourne (comptes, bornes des classes).
+    Le nombre de classes suit la règle choisie, limité à `max_bins` avant que
+    les bornes soient calculées: une valeur extrême ne multiplie pas les classes.
+    """
+    values = _finite_values(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), np.array([0.0, 1.0])
+
+    low, high = values.min(), values.max()
+    width = _bin_width(values, rule)
+    n_bins = int(min(np.ceil((high - low) / width), max_bins)) if width > 0 else 1
+    # Classes de largeur constante: NumPy les calcule sans recherche dichotomique
+    return np.histogram(values, bins=max(n_bins, 1), range=(low, high))
+
+
+def time_bucket(dates, freq):
+    """
+    Ramène chaque date au début de sa période (jour, semaine commençant le lundi,
+    mois, trimestre ou année). Les dates manquantes restent NaT.
+    """
+    dates = pd.Series(dates)
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    missing = np.isnat(values)
+
+    if freq == "W":
+        days = values.astype("datetime64[D]").astype(np.int64)
+        # Le 1er janvier 1970 était un jeudi (jour 3 si lundi = 0)
+        buckets = (days - (days + 3) % 7).astype("datetime64[D]")
+    elif freq == "Q":
+        months = values.astype("datetime64[M]").astype(np.int64)
+        buckets = (months - months % 3).astype("datetime64[M]")
+    else:
+        buckets = values.astype(f"datetime64[{freq}]")
+
+    buckets = buckets.astype("datetime64[ns]")
+    buckets[missing] = np.datetime64("NaT")
+    return buckets
+
+
+def group_aggregate(keys, values, agg):
+    """
+    Agrège `values` par valeur de `keys` ("sum", "mean" ou "count") avec np.bincount.
+    Les clés et valeurs manquantes sont ignorées. Retourne une Series indexée par clé triée.
+    """
+    codes, uniques = pd.factorize(keys, sort=True)
+    values = np.asarray(values, dtype=np.float64)
+    valid = (codes >= 0) & np.isfinite(values)
+    codes = codes[valid]
+    n_groups = len(uniques)
+
+    counts = np.bincount(codes, minlength=n_groups)
+    if agg == "count":
+        result = counts
+    elif agg in ("sum", "mean"):
+        sums = np.bincount(codes, weights=values[valid], minlength=n_groups)
+        if agg == "sum":
+            result = sums
+        else:
+            result = np.divide(sums, counts, out=np.full(n_groups, np.nan), where=counts > 0)
+    else:
+        raise ValueError(f"Agrégation inconnue: {agg}")
+
+    return pd.Series(result, index=uniques)
+
+
+@st.cache_data(show_spinner=False)
+def get_histogram(dataset_key, column, rule, _values):
+    """Histogramme d'une colonne, mis en cache par (dataset, colonne, règle)"""
+    return histogram(_values, rule)
+
+
+@st.cache_data(show_spinner=False)
+def get_group_aggregate(dataset_key, group_column, freq, value_column, agg, _keys, _values):
+    """
+    Agrégat d'une colonne par groupe, mis en cache par (dataset, groupe, période, colonne, fonction).
+    Si `freq` est donné, les clés sont des dates regroupées par période.
+    """
+    keys = time_bucket(_keys, freq) if freq else _keys
+    return group_aggregate(keys, _values, agg)
@@ -0,0 +1,122 @@
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Nombre maximal de valeurs distinctes conservées pour une colonne catégorielle
+CATALOG_MAX_DISTINCT = 20
+# Nombre de valeurs testées pour détecter une colonne texte contenant des dates
+DATETIME_SAMPLE_SIZE = 100
+# Forme d'une date texte: année-mois(-jour) ou jour/mois/année, heure optionnelle.
+# Les entiers seuls ("2020", "001") et les noms de mois ne sont pas des dates.
+DATE_PATTERN = re.compile(
+    r"\s*(\d{4}[-/.]\d{1,2}([-/.]\d{1,2})?|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})([ T]\S.*)?\s*"
+)
+
+
+def _parse_datetime(series):
+    """
+    Retourne la colonne convertie en dates si c'est une colonne texte de dates,
+    sinon None. La détection se fait sur un échantillon avant la conversion complète:
+    chaque valeur doit avoir la forme d'une date (DATE_PATTERN) et être convertible.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Seules les catégories sont converties, puis réparties sur les lignes
+        parsed = _parse_datetime(pd.Series(series.cat.categories))
+        if parsed is None:
+            return None
+        # Le code -1 (valeur manquante) pointe sur le NaT ajouté en dernière position
+        values = np.append(parsed.to_numpy(), np.datetime64("NaT"))
+        return pd.Series(values[series.cat.codes.to_numpy()], index=series.index)
+
+    sample = series.dropna().head(DATETIME_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+
+    sample = sample.astype(str)
+    if not sample.str.fullmatch(DATE_PATTERN).all():
+        return None
+    # Dates jour/mois/année (format français) si aucune ne commence par l'année
+    dayfirst = not sample.str.match(r"\s*\d{4}").any()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        warnings.simplefilter("ignore", FutureWarning)
+        try:
+            if pd.to_datetime(sample, errors="coerce", format="mixed", dayfirst=dayfirst).isna().any():
+                return None
+            parsed = pd.to_datetime(series.astype(str), errors="coerce", format="mixed", dayfirst=dayfirst)
+        except (ValueError, TypeError):
+            return None  # Fuseaux horaires mélangés
+    return parsed if pd.api.types.is_datetime64_any_dtype(parsed) else None
+
+
+def _describe_column(series):
+    """Calcule les métadonnées d'une colonne en un seul passage par statistique"""
+    info = {
+        "dtype": str(series.dtype),
+        "null_count": int(series.isna().sum()),
+        "semantic": "text",
+        "min": None,
+        "max": None,
+        "n_unique": None,
+        "values": None,
+        "parsed": None,
+    }
+
+    if pd.api.types.is_bool_dtype(series):
+        info["semantic"] = "boolean"
+    elif pd.api.types.is_numeric_dtype(series):
+        info["semantic"] = "numeric"
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        info["semantic"] = "datetime"
+    else:
+        parsed = _parse_datetime(series)
+        if parsed is not None:
+            info["semantic"] = "datetime"
+            info["parsed"] = parsed
+            # Les textes qui ne sont pas des dates comptent comme valeurs manquantes
+            info["null_count"] = int(parsed.isna().sum())
+        else:
+            info["n_unique"] = int(series.nunique(dropna=False))
+            if info["n_unique"] <= CATALOG_MAX_DISTINCT:
+                info["semantic"] = "categorical"
+
+    if info["semantic"] in ("numeric", "datetime"):
+        values = info["parsed"] if info["parsed"] is not None else series
+        if info["null_count"] < len(series):
+            info["min"] = values.min()
+            info["max"] = values.max()
+    else:
+        if info["n_unique"] is None:
+            info["n_unique"] = int(series.nunique(dropna=False))
+        if info["n_unique"] <= CATALOG_MAX_DISTINCT:
+            info["values"] = list(series.unique())
+
+    return info
+
+
+def build_catalog(df):
+    """
+    Construit le catalogue des colonnes d'un jeu de données:
+    type sémantique, nombre de valeurs manquantes, min/max,
+    valeurs distinctes (jusqu'à CATALOG_MAX_DISTINCT) et dates converties.
+    """
+    return {col: _describe_column(df[col]) for col in df.columns}
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_catalog(dataset_id, _df):
+    """
+    Retourne le catalogue du jeu de données, calculé une seule fois par dataset.
+    Le catalogue est partagé en lecture seule: il ne doit pas être modifié.
+    """
+    return build_catalog(_df)
+
+
+def datetime_column(catalog, df, col):
+    """Retourne la colonne de dates, convertie au chargement si nécessaire"""
+    parsed = catalog[col]["parsed"]
+    return parsed if parsed is not None else df[col]
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Nombre maximal de valeurs distinctes d'une colonne entière utilisée comme dimension
+CUBE_MAX_LEVELS = 32
+# Nombre maximal de cellules du cube (produit des nombres de valeurs des dimensions)
+CUBE_MAX_CELLS = 1_000_000
+
+
+def _dimension_columns(df, catalog):
+    """
+    Colonnes peu variées servant de dimensions: colonnes catégorielles et booléennes
+    du catalogue, et colonnes entières comptant peu de valeurs distinctes (ex. mois).
+    """
+    dimensions = []
+    for col, info in catalog.items():
+        if info["semantic"] in ("categorical", "boolean") and info["values"] is not None:
+            dimensions.append(col)
+        elif (
+            info["semantic"] == "numeric"
+            and pd.api.types.is_integer_dtype(df[col])
+            and df[col].nunique() <= CUBE_MAX_LEVELS
+        ):
+            dimensions.append(col)
+    return dimensions
+
+
+def build_cube(df, catalog):
+    """
+    Construit un cube d'agrégats: pour chaque combinaison des valeurs des dimensions,
+    le nombre de lignes et, pour chaque mesure numérique, le nombre de valeurs,
+    leur somme et la somme de leurs carrés. Retourne None sans dimension utilisable.
+    """
+    levels = {}
+    codes = []
+    n_cells = 1
+    for col in _dimension_columns(df, catalog):
+        col_codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        n_levels = len(uniques) + 1
+        if n_cells * n_levels > CUBE_MAX_CELLS:
+            continue
+        # Les valeurs manquantes forment la dernière modalité
+        col_codes[col_codes < 0] = len(uniques)
+        levels[col] = pd.Index(list(uniques) + [np.nan], dtype=object)
+        codes.append(col_codes)
+        n_cells *= n_levels
+
+    if not levels:
+        return None
+
+    shape = tuple(len(index) for index in levels.values())
+    cells = np.ravel_multi_index(codes, shape)
+
+    measures = {}
+    for col, info in catalog.items():
+        if info["semantic"] != "numeric":
+            continue
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(values)
+        valid_cells = cells[valid]
+        values = values[valid]
+        measures[col] = {
+            "count": np.bincount(valid_cells, minlength=n_cells).reshape(shape),
+            "sum": np.bincount(valid_cells, weights=values, minlength=n_cells).reshape(shape),
+            "sumsq": np.bincount(valid_cells, weights=values * values, minlength=n_cells).reshape(shape),
+        }
+
+    return {
+        "levels": levels,
+        "rows": np.bincount(cells, minlength=n_cells).reshape(shape),
+        "measures": measures,
+    }
+
+
+@st.cache_resource(max_entries=4, show_spinner="Construction du cube d'agrégats...")
+def get_cube(dataset_id, _df, _catalog):
+    """Retourne le cube du jeu de données, construit une seule fois par dataset"""
+    return build_cube(_df, _catalog)
+
+
+def cube_aggregates(cube, predicates, aggregates):
+    """
+    Calcule des agrégats à partir du cube, sans parcourir les lignes.
+    `aggregates` est une liste de tuples (nom, fonction, colonne ou None) avec les
+    fonctions "count", "sum", "avg" et "stddev". Retourne un dictionnaire nom -> valeur,
+    ou None si un prédicat ou une mesure n'est pas couvert par le cube.
+    """
+    if cube is None:
+        return None
+
+    dimensions = list(cube["levels"])
+    selections = {}
+    for kind, column, value in predicates:
+        if kind != "isin" or column not in cube["levels"]:
+            return None
+        values = [v for v in value if not pd.isna(v)]
+        selected = cube["levels"][column].isin(values)
+        # Une valeur manquante sélectionnée désigne la dernière modalité
+        selected[-1] = len(values) < len(value)
+        selections[column] = selections.get(column, selected) & selected
+
+    def total(array):
+        for column, selected in selections.items():
+            array = array.compress(selected, axis=dimensions.index(column))
+        return array.sum()
+
+    result = {}
+    for name, func, col in aggregates:
+        if col is None:
+            if func != "count":
+                return None
+            result[name] = int(total(cube["rows"]))
+            continue
+
+        measure = cube["measures"].get(col)
+        if measure is None:
+            return None
+        count = total(measure["count"])
+        if func == "count":
+            result[name] = int(count)
+        elif func == "sum":
+            result[name] = total(measure["sum"])
+        elif func == "avg":
+            result[name] = total(measure["sum"]) / count if count else np.nan
+        elif func == "stddev":
+            if count < 2:
+                result[name] = np.nan
+            else:
+                sum_ = total(measure["sum"])
+                variance = (total(measure["sumsq"]) - sum_ * sum_ / count) / (count - 1)
+                result[name] = np.sqrt(max(variance, 0.0))
+        else:
+            return None
+    return result
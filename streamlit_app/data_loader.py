@@ -1,37 +1,498 @@
+import hashlib
+import io
+import os
+import uuid
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import streamlit as st
 
-@st.cache_data
-def load_data(file):
+import dataset_cache
+import dataset_store
+import excel
+import summaries
+from tracing import span
+
+# Dossier des fichiers de données locaux (ouverts en mémoire mappée)
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Formats colonnes lisibles sans conversion
+COLUMNAR_EXTENSIONS = (".parquet", ".feather", ".arrow")
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx") + COLUMNAR_EXTENSIONS
+# Formats lus directement depuis le dossier data/
+LOCAL_EXTENSIONS = (".csv",) + COLUMNAR_EXTENSIONS
+
+# Taille des blocs lus par le lecteur CSV Arrow (mémoire bornée par bloc)
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+# Taille de l'échantillon utilisé pour inférer le schéma
+CSV_SAMPLE_SIZE = 1024 * 1024
+
+
+def _infer_csv_schema(file):
     """
-    Charge les données depuis différents formats.
-    Supporte CSV et Excel.
+    Infère le schéma d'un CSV à partir d'un échantillon du début du fichier.
+    Les entiers et flottants sont élargis en 64 bits pour que les blocs
+    suivants ne sortent pas du type inféré.
+    """
+    file.seek(0)
+    sample = file.read(CSV_SAMPLE_SIZE)
+    file.seek(0)
+
+    # Couper l'échantillon à la dernière ligne complète
+    if len(sample) == CSV_SAMPLE_SIZE:
+        sample = sample[: sample.rfind(b"\n") + 1]
+
+    sample_table = pacsv.read_csv(io.BytesIO(sample))
+
+    fields = []
+    for field in sample_table.schema:
+        if pa.types.is_integer(field.type):
+            fields.append(pa.field(field.name, pa.int64()))
+        elif pa.types.is_floating(field.type):
+            fields.append(pa.field(field.name, pa.float64()))
+        elif pa.types.is_null(field.type):
+            # Colonne vide dans l'échantillon: la lire comme texte
+            fields.append(pa.field(field.name, pa.string()))
+        else:
+            fields.append(field)
+    return pa.schema(fields)
+
+
+def _read_csv_streaming(file, progress=None):
+    """
+    Lit un CSV par blocs avec le moteur Arrow en affichant la progression.
+    Si `progress` est donné, il est appelé après chaque bloc avec la part du
+    fichier lue et le bloc, à la place de la barre de progression.
+    Retourne une table Arrow.
+    """
+    schema = _infer_csv_schema(file)
+    total_size = max(file.seek(0, os.SEEK_END), 1)
+    file.seek(0)
+
+    reader = pacsv.open_csv(
+        file,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(column_types=schema),
+    )
+
+    bar = st.progress(0.0, text="Lecture du fichier CSV...") if progress is None else None
+    batches = []
+    n_rows = 0
+    try:
+        for batch in reader:
+            batches.append(batch)
+            n_rows += batch.num_rows
+            fraction = min(file.tell() / total_size, 1.0)
+            if bar is None:
+                progress(fraction, batch)
+            else:
+                bar.progress(fraction, text=f"Lecture du fichier CSV... {n_rows:,} lignes")
+    finally:
+        if bar is not None:
+            bar.empty()
+
+    return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def _read_csv(file, progress=None):
+    """
+    Charge un CSV en DataFrame via la lecture par blocs Arrow.
+    Si un bloc ne respecte pas le schéma inféré, relit le fichier en entier.
     """
-    file_name = file.name.lower()
-    
     try:
+        table = _read_csv_streaming(file, progress)
+    except pa.ArrowInvalid:
+        file.seek(0)
+        return pd.read_csv(file, engine="pyarrow")
+
+    return _arrow_to_pandas(table)
+
+
+def _arrow_to_pandas(table):
+    """Conversion unique vers pandas, en libérant les buffers Arrow au fur et à mesure"""
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+def _read_chunks(source, file_name, progress, columns=None):
+    """
+    Lit un fichier Parquet (row group par row group) ou Arrow IPC
+    (record batch par record batch) en signalant l'avancement à `progress`.
+    """
+    if file_name.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(source)
+        n_chunks = parquet_file.num_row_groups
+        chunks = (parquet_file.read_row_group(i, columns=columns) for i in range(n_chunks))
+        schema = parquet_file.schema_arrow
+    else:
+        reader = pa.ipc.open_file(source)
+        n_chunks = reader.num_record_batches
+        chunks = (reader.get_batch(i) for i in range(n_chunks))
+        schema = reader.schema
+
+    tables = []
+    for i, chunk in enumerate(chunks):
+        progress((i + 1) / n_chunks, chunk)
+        tables.append(pa.Table.from_batches([chunk]) if isinstance(chunk, pa.RecordBatch) else chunk)
+
+    if not tables:
+        return schema.empty_table()
+    table = pa.concat_tables(tables)
+    return table if columns is None else table.select(columns)
+
+
+def _read_columnar(source, file_name, columns=None, filters=None, progress=None):
+    """
+    Lit un fichier Parquet, Feather ou Arrow IPC en table Arrow.
+    `source` est un chemin (ouvert en mémoire mappée) ou un objet fichier.
+    `filters` suit la syntaxe de pyarrow.parquet (liste de tuples ou expression).
+    Les fichiers CSV locaux sont lus par blocs puis projetés et filtrés de la même façon.
+    Si `progress` est donné, le fichier est lu bloc par bloc et `progress` reçoit
+    l'avancement (voir _read_csv_streaming).
+    """
+    memory_map = isinstance(source, str)
+
+    if progress is not None and not file_name.endswith(".csv"):
+        table = _read_chunks(source, file_name, progress, columns=columns)
+    elif file_name.endswith(".parquet"):
+        # Les filtres élaguent les row groups grâce à leurs statistiques
+        return pq.read_table(source, columns=columns, filters=filters, memory_map=memory_map)
+    elif file_name.endswith(".csv"):
+        with open(source, "rb") as file:
+            table = _read_csv_streaming(file, progress)
+        if columns is not None:
+            table = table.select(columns)
+    else:
+        table = feather.read_table(source, columns=columns, memory_map=memory_map)
+
+    if filters is not None:
+        if not isinstance(filters, pc.Expression):
+            filters = pq.filters_to_expression(filters)
+        table = table.filter(filters)
+    return table
+
+
+def _read_columnar_head(path, n_rows, columns=None):
+    """
+    Lit les premières lignes d'un fichier local sans charger le reste:
+    seuls les premiers row groups (Parquet), record batches (IPC)
+    ou le premier bloc (CSV) sont lus.
+    """
+    read_rows = 0
+
+    if path.lower().endswith(".csv"):
+        with pacsv.open_csv(path) as reader:
+            table = pa.Table.from_batches([reader.read_next_batch()])
+        if columns is not None:
+            table = table.select(columns)
+    elif path.lower().endswith(".parquet"):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        row_groups = []
+        for i in range(parquet_file.num_row_groups):
+            if read_rows >= n_rows:
+                break
+            row_groups.append(i)
+            read_rows += parquet_file.metadata.row_group(i).num_rows
+        table = parquet_file.read_row_groups(row_groups, columns=columns)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        batches = []
+        for i in range(reader.num_record_batches):
+            if read_rows >= n_rows:
+                break
+            batch = reader.get_batch(i)
+            batches.append(batch)
+            read_rows += batch.num_rows
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        if columns is not None:
+            table = table.select(columns)
+
+    return table.slice(0, n_rows)
+
+
+# Marqueur posé sur les DataFrames déjà normalisés (conservé par head, copy, sous-ensembles...)
+NORMALIZED_ATTR = "dtypes_normalized"
+
+
+def normalize_dtypes(df):
+    """
+    Convertit les types problématiques pour Arrow et Plotly.
+    Appelée une seule fois au chargement: le DataFrame est modifié en place
+    puis marqué comme normalisé.
+    """
+    for col in df.columns:
+        col_type_str = str(df[col].dtype)
+        if col_type_str in ['Int64', 'Int32', 'Int16', 'Int8']:
+            df[col] = df[col].astype('int64')
+        elif col_type_str in ['Float64', 'Float32']:
+            df[col] = df[col].astype('float64')
+        elif df[col].dtype == 'object':
+            try:
+                df[col] = df[col].astype('str')
+            except:
+                pass
+    df.attrs[NORMALIZED_ATTR] = True
+    return df
+
+
+def ensure_normalized(df):
+    """
+    Retourne le DataFrame tel quel s'il a déjà été normalisé au chargement,
+    sinon une copie normalisée.
+    """
+    if df is None or df.attrs.get(NORMALIZED_ATTR):
+        return df
+    return normalize_dtypes(df.copy())
+
+
+# Seuils de cardinalité pour convertir une colonne texte en `category`
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+# Rapport mémoire par colonne (octets avant/après optimisation)
+MEMORY_REPORT_ATTR = "memory_report"
+
+
+def _compact_column(series):
+    """Retourne la colonne dans le type le plus compact qui conserve ses valeurs"""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+
+    if pd.api.types.is_float_dtype(series):
+        downcast = series.astype("float32")
+        # Ne réduire la précision que si aucune valeur n'est altérée
+        if np.array_equal(downcast.to_numpy(dtype="float64"), series.to_numpy(dtype="float64"), equal_nan=True):
+            return downcast
+        return series
+
+    if pd.api.types.is_string_dtype(series):
+        n_unique = series.nunique()
+        if n_unique <= CATEGORY_MAX_UNIQUE and n_unique <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype("category")
+        if series.dtype == "object":
+            # Chaînes stockées dans un buffer Arrow plutôt qu'en objets Python
+            return series.astype("string[pyarrow]")
+
+    return series
+
+
+def optimize_dtypes(df):
+    """
+    Réduit l'empreinte mémoire du DataFrame au chargement:
+    colonnes texte peu variées en `category`, entiers et flottants réduits
+    lorsque les valeurs le permettent, autres textes en chaînes Arrow.
+    Le gain par colonne est conservé dans `df.attrs` pour `describe_data`.
+    """
+    report = {}
+    for col in df.columns:
+        before = int(df[col].memory_usage(index=False, deep=True))
+        df[col] = _compact_column(df[col])
+        after = int(df[col].memory_usage(index=False, deep=True))
+        report[col] = (before, after)
+
+    df.attrs[MEMORY_REPORT_ATTR] = report
+    return df
+
+
+# Identifiant du jeu de données, utilisé comme clé des caches dérivés (catalogue, index...)
+DATASET_ID_ATTR = "dataset_id"
+
+
+def dataset_id(df):
+    """
+    Retourne l'identifiant stable du jeu de données chargé.
+    Les fichiers chargés sont identifiés par leur contenu; les autres
+    DataFrames reçoivent un identifiant unique au premier appel.
+    """
+    if DATASET_ID_ATTR not in df.attrs:
+        df.attrs[DATASET_ID_ATTR] = uuid.uuid4().hex
+    return df.attrs[DATASET_ID_ATTR]
+
+
+def _read_excel(file, key, sheet, progress=None):
+    """
+    Lit toutes les feuilles d'un classeur en parallèle et les met en cache
+    une par une: changer de feuille ne relit pas le classeur.
+    Retourne la feuille demandée.
+    """
+    sheets = excel.sheet_names(file.file_id, file)
+    selected = None
+    for done, (name, table) in enumerate(excel.read_sheets(file.getvalue(), sheets), start=1):
+        if progress is not None:
+            # Seule la feuille demandée alimente l'aperçu et le nombre de lignes
+            progress(done / len(sheets), table if name == sheet else table.slice(0, 0))
+        df = optimize_dtypes(normalize_dtypes(_arrow_to_pandas(table)))
+        df.attrs[DATASET_ID_ATTR] = _sheet_key(key, name)
+        _cache(df)
+        if name == sheet:
+            selected = df
+    return selected
+
+
+def _sheet_key(key, sheet):
+    """Clé de cache d'une feuille: empreinte du classeur et du nom de la feuille"""
+    if sheet is None:
+        return key
+    return hashlib.blake2b(f"{key}:{sheet}".encode(), digest_size=16).hexdigest()
+
+
+def upload_source(file, sheet=None):
+    """Identifiant d'un fichier chargé (et de la feuille choisie pour un classeur Excel)"""
+    return file.file_id if sheet is None else f"{file.file_id}:{sheet}"
+
+
+def _load_file(file, key, sheet=None, progress=None):
+    """Lit un fichier chargé, depuis le cache disque si possible"""
+    with span("load_data.cache") as record:
+        df = dataset_cache.get(_sheet_key(key, sheet))
+        record["rows"] = None if df is None else len(df)
+    if df is not None:
+        return df
+
+    file_name = file.name.lower()
+    if file_name.endswith(".xlsx"):
+        # Feuilles déjà optimisées et mises en cache
+        with span("load_data.excel") as record:
+            df = _read_excel(file, key, sheet, progress)
+            record["rows"] = None if df is None else len(df)
+        return df
+
+    with span("load_data.parse") as record:
         if file_name.endswith(".csv"):
-            df = pd.read_csv(file)
-        elif file_name.endswith(".xlsx"):
-            df = pd.read_excel(file)
+            df = _read_csv(file, progress)
+        elif file_name.endswith(COLUMNAR_EXTENSIONS):
+            df = _arrow_to_pandas(_read_columnar(file, file_name, progress=progress))
         else:
-            st.error(f"Format non supporté: {file_name}")
+            raise ValueError(f"Format non supporté: {file_name}")
+        record["rows"] = len(df)
+
+    with span("load_data.normalize", rows=len(df)):
+        df = optimize_dtypes(normalize_dtypes(df))
+    df.attrs[DATASET_ID_ATTR] = key
+    _cache(df)
+    return df
+
+
+def _cache(df):
+    """
+    Met un DataFrame normalisé en cache sur disque avec les résumés de ses colonnes:
+    un chargement depuis le cache ne les recalcule pas
+    """
+    key = df.attrs[DATASET_ID_ATTR]
+    dataset_cache.put(key, df, summaries.summaries_to_json(summaries.get_summary(key, df)))
+
+
+def _with_summary(df):
+    """
+    Résume les colonnes du jeu de données dès le chargement (un passage par blocs):
+    les tableaux descriptifs sont ensuite affichés sans relire les données
+    """
+    if df is not None:
+        summaries.get_summary(df.attrs[DATASET_ID_ATTR], df)
+    return df
+
+
+def load_data(file, progress=None, sheet=None):
+    """
+    Charge les données depuis différents formats.
+    Supporte CSV, Excel, Parquet, Feather et Arrow IPC.
+    Les CSV sont lus par blocs avec le moteur Arrow; pour un classeur Excel,
+    `sheet` désigne la feuille (par défaut la première).
+    Le résultat est mis en cache sur disque, indexé par le contenu du fichier,
+    et partagé en mémoire entre les sessions: retourne un handle du registre
+    (dataset_store), ou None en cas d'erreur.
+    Avec `progress` (chargement hors du thread du script, voir ingestion.py),
+    l'avancement lui est transmis bloc par bloc et les erreurs sont levées
+    au lieu d'être affichées.
+    """
+    if sheet is None and file.name.lower().endswith(".xlsx"):
+        try:
+            sheet = excel.sheet_names(file.file_id, file)[0]
+        except Exception as e:
+            if progress is not None:
+                raise
+            st.error(f"Erreur: {e}")
             return None
-        
-        # Convertir les types problématiques pour Arrow
-        for col in df.columns:
-            col_type_str = str(df[col].dtype)
-            if col_type_str in ['Int64', 'Int32', 'Int16', 'Int8']:
-                df[col] = df[col].astype('int64')
-            elif col_type_str in ['Float64', 'Float32']:
-                df[col] = df[col].astype('float64')
-            elif df[col].dtype == 'object':
-                try:
-                    df[col] = df[col].astype('str')
-                except:
-                    pass
-            
-        return df
+    key = dataset_cache.content_hash(file)
+    source = upload_source(file, sheet)
+
+    if progress is not None:
+        return dataset_store.acquire(
+            _sheet_key(key, sheet), lambda: _with_summary(_load_file(file, key, sheet, progress)), source=source
+        )
+
+    def load():
+        try:
+            with st.spinner("Chargement des données..."):
+                return _with_summary(_load_file(file, key, sheet))
+        except Exception as e:
+            st.error(f"Erreur: {e}")
+            return None
+
+    return dataset_store.acquire(_sheet_key(key, sheet), load, source=source)
+
+
+def list_data_files():
+    """Liste les fichiers de données disponibles dans le dossier data/"""
+    if not os.path.isdir(DATA_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(DATA_DIR)
+        if name.lower().endswith(LOCAL_EXTENSIONS)
+    )
+
+
+def _file_version(path):
+    """Version d'un fichier local: date de modification (ns) et taille"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def load_local_data(path, columns=None, filters=None):
+    """
+    Charge un fichier Parquet, Feather, Arrow IPC ou CSV du dossier data/.
+    Les fichiers colonnes sont ouverts en mémoire mappée et seules les colonnes
+    demandées et les row groups retenus par les filtres sont lus.
+    Retourne un handle du registre partagé (dataset_store), ou None en cas d'erreur.
+    """
+    key = f"{path}:{_file_version(path)}:{columns}:{filters}"
+
+    def load():
+        try:
+            with st.spinner("Chargement des données..."):
+                table = _read_columnar(path, path.lower(), columns=columns, filters=filters)
+                df = optimize_dtypes(normalize_dtypes(_arrow_to_pandas(table)))
+                df.attrs[DATASET_ID_ATTR] = key
+                return _with_summary(df)
+        except Exception as e:
+            st.error(f"Erreur: {e}")
+            return None
+
+    return dataset_store.acquire(key, load, source=os.path.basename(path))
+
+
+@st.cache_data
+def _local_preview(path, version, n_rows, columns):
+    """Premières lignes d'un fichier local, dans sa version `version` (clé du cache)"""
+    table = _read_columnar_head(path, n_rows, columns=columns)
+    return normalize_dtypes(_arrow_to_pandas(table))
+
+
+def load_local_preview(path, n_rows=5, columns=None):
+    """
+    Retourne les premières lignes d'un fichier local
+    sans matérialiser le fichier complet. Un fichier réécrit
+    (date de modification ou taille différente) est relu.
+    """
+    try:
+        return _local_preview(path, _file_version(path), n_rows, columns)
     except Exception as e:
         st.error(f"Erreur: {e}")
         return None
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Dossier du cache disque (configurable par variable d'environnement)
+CACHE_DIR = os.environ.get(
+    "DATASET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".cache"),
+)
+# Budget du cache en octets, au-delà duquel les entrées les moins récentes sont supprimées
+CACHE_MAX_BYTES = int(os.environ.get("DATASET_CACHE_MAX_BYTES", 2 * 1024**3))
+
+_CACHE_EXTENSION = ".feather"
+# Clé des métadonnées Arrow où sont conservés les `attrs` du DataFrame
+_ATTRS_METADATA_KEY = b"dataset_attrs"
+# Clé des métadonnées Arrow où sont conservés les résumés des colonnes (voir summaries.py)
+_SUMMARIES_METADATA_KEY = b"dataset_summaries"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def content_hash(file):
+    """Calcule l'empreinte du contenu d'un fichier chargé (sans copie des octets)"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(file.getbuffer())
+    return hasher.hexdigest()
+
+
+def frame_to_table(df, summaries=None):
+    """
+    Convertit un DataFrame en table Arrow en conservant ses `attrs` dans les métadonnées,
+    ainsi que les résumés sérialisés de ses colonnes s'ils sont fournis
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), _ATTRS_METADATA_KEY: json.dumps(df.attrs)}
+    if summaries is not None:
+        metadata[_SUMMARIES_METADATA_KEY] = summaries
+    return table.replace_schema_metadata(metadata)
+
+
+def table_to_frame(table):
+    """Convertit une table écrite par frame_to_table en DataFrame, `attrs` compris"""
+    attrs = (table.schema.metadata or {}).get(_ATTRS_METADATA_KEY)
+    df = table.to_pandas(split_blocks=True)
+    if attrs:
+        df.attrs.update(json.loads(attrs))
+    return df
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key + _CACHE_EXTENSION)
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def get(key):
+    """
+    Retourne le DataFrame mis en cache pour cette empreinte, ou None.
+    Le fichier est ouvert en mémoire mappée et marqué comme récemment utilisé.
+    """
+    path = _entry_path(key)
+    try:
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)
+    except (OSError, pa.ArrowException):
+        _count("misses")
+        return None
+
+    _count("hits")
+    return table_to_frame(table)
+
+
+def get_summaries(key):
+    """
+    Retourne les résumés sérialisés enregistrés avec le DataFrame de cette empreinte,
+    ou None. Seul le schéma du fichier est lu.
+    """
+    try:
+        with pa.memory_map(_entry_path(key)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowException):
+        return None
+
+    summaries = metadata.get(_SUMMARIES_METADATA_KEY)
+    return None if summaries is None else summaries.decode()
+
+
+def put(key, df, summaries=None):
+    """
+    Enregistre un DataFrame normalisé dans le cache (avec les résumés sérialisés
+    de ses colonnes s'ils sont fournis) puis applique le budget.
+    Le cache est une optimisation: une erreur d'écriture est ignorée.
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        table = frame_to_table(df, summaries)
+
+        # Écriture atomique pour les sessions concurrentes
+        tmp_path = os.path.join(CACHE_DIR, f".{key}.{uuid.uuid4().hex}.tmp")
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, _entry_path(key))
+    except (OSError, TypeError, pa.ArrowException):
+        return
+
+    evict()
+
+
+def _entries():
+    """Liste les entrées du cache (chemin, taille, date du dernier accès)"""
+    entries = []
+    if not os.path.isdir(CACHE_DIR):
+        return entries
+
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(_CACHE_EXTENSION):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def evict(max_bytes=None):
+    """Supprime les entrées les moins récemment utilisées au-delà du budget"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = sorted(_entries(), key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in entries)
+
+    for path, size, _ in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cache_stats():
+    """Retourne les compteurs de hits/misses et l'occupation du cache"""
+    entries = _entries()
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["entries"] = len(entries)
+    stats["bytes"] = sum(size for _, size, _ in entries)
+    return stats
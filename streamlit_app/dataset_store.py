@@ -0,0 +1,367 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from dataset_cache import frame_to_table, table_to_frame
+
+# Les sessions reçoivent des copies superficielles des jeux de données partagés:
+# le copy-on-write (toujours actif à partir de pandas 3) isole leurs modifications
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# Clé de session où est conservé le handle du jeu de données de la session
+SESSION_KEY = "dataset"
+# Clé de session du chargement en cours (Future dont le résultat est un handle)
+PENDING_KEY = "dataset_pending"
+
+# Mémoire totale des jeux de données gardés en mémoire et de leurs structures dérivées
+# (index, masques, ordres de tri), au-delà de laquelle les moins récemment utilisés
+# sont libérés: structures supprimées, jeux de données déchargés sur disque
+MEMORY_BUDGET_BYTES = int(os.environ.get("DATASET_MEMORY_BUDGET", 4 * 1024**3))
+# Dossier des jeux de données déchargés (fichiers Parquet, vidé au démarrage)
+SPILL_DIR = os.environ.get(
+    "DATASET_SPILL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".spill"),
+)
+
+
+class DatasetHandle:
+    """
+    Référence d'une session vers un jeu de données partagé.
+    Le jeu de données est libéré du registre quand plus aucun handle ne le
+    référence: à la fermeture explicite, ou quand la session disparaît.
+    """
+
+    def __init__(self, key, source=None):
+        self.key = key
+        self.source = source
+        self._release = weakref.finalize(self, _release, key)
+
+    def close(self):
+        """Libère la référence (sans effet si elle l'est déjà)"""
+        self._release()
+
+
+@st.cache_resource
+def _registry():
+    """
+    Registre partagé par toutes les sessions du processus: clé -> entrée,
+    et (clé, nom) -> structure dérivée du jeu de données
+    """
+    # Les fichiers d'un processus précédent ne sont plus référencés
+    shutil.rmtree(SPILL_DIR, ignore_errors=True)
+    return {"lock": threading.Lock(), "entries": {}, "loading": {}, "derived": {}, "building": {}}
+
+
+def _key_lock(registry, key):
+    """Verrou propre à une clé: un seul chargement ou rechargement à la fois"""
+    with registry["lock"]:
+        return registry["loading"].setdefault(key, threading.Lock())
+
+
+def _remove_spill(path):
+    if path is not None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _release(key):
+    registry = _registry()
+    with registry["lock"]:
+        entry = registry["entries"].get(key)
+        if entry is None:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            return
+        del registry["entries"][key]
+        registry["loading"].pop(key, None)
+        for derived_key in [derived_key for derived_key in registry["derived"] if derived_key[0] == key]:
+            del registry["derived"][derived_key]
+    _remove_spill(entry["path"])
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _object_bytes(value):
+    """Taille des tableaux d'une structure dérivée (tableaux NumPy, dictionnaires, listes)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_object_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_object_bytes(item) for item in value)
+    return 0
+
+
+def _spill(key, df):
+    """Écrit un jeu de données en Parquet dans SPILL_DIR et retourne le chemin"""
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    path = os.path.join(SPILL_DIR, f"{name}.parquet")
+    tmp_path = f"{path}.tmp"
+    pq.write_table(frame_to_table(df), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _enforce_budget(keep_key=None, keep_derived=None):
+    """
+    Libère les jeux de données et les structures dérivées les moins récemment
+    utilisés tant que la mémoire occupée dépasse MEMORY_BUDGET_BYTES: une
+    structure dérivée est supprimée (elle sera reconstruite à la demande),
+    un jeu de données est déchargé sur disque.
+    Le jeu de données `keep_key` et la structure `keep_derived`, en cours
+    d'utilisation, sont conservés.
+    """
+    registry = _registry()
+    while True:
+        with registry["lock"]:
+            in_memory = [
+                (key, entry) for key, entry in registry["entries"].items()
+                if entry["df"] is not None
+            ]
+            total = sum(entry["bytes"] for _, entry in in_memory)
+            total += sum(item["bytes"] for item in registry["derived"].values())
+            if total <= MEMORY_BUDGET_BYTES:
+                return
+            candidates = [
+                (item["last_access"], "derived", derived_key)
+                for derived_key, item in registry["derived"].items()
+                if derived_key != keep_derived
+            ]
+            candidates += [(entry["last_access"], "dataset", key) for key, entry in in_memory if key != keep_key]
+            if not candidates:
+                return
+            _, kind, key = min(candidates, key=lambda candidate: candidate[0])
+            if kind == "derived":
+                del registry["derived"][key]
+                continue
+            entry = registry["entries"][key]
+            df, path = entry["df"], entry["path"]
+
+        # Un jeu de données déjà déchargé une fois n'est pas réécrit: il est immuable
+        if path is None:
+            try:
+                path = _spill(key, df)
+            except (OSError, pa.ArrowException):
+                return  # Disque indisponible: les données restent en mémoire
+
+        with registry["lock"]:
+            entry = registry["entries"].get(key)
+            if entry is not None:
+                entry["path"] = path
+                entry["df"] = None
+        if entry is None:
+            _remove_spill(path)
+
+
+def acquire(key, loader, source=None):
+    """
+    Retourne un handle vers le jeu de données `key`, chargé par `loader()`
+    seulement s'il n'est pas déjà en mémoire. Les sessions qui chargent le
+    même jeu de données partagent une seule copie. Retourne None si le
+    chargement échoue (`loader` retourne None).
+    """
+    registry = _registry()
+    with registry["lock"]:
+        entry = registry["entries"].get(key)
+        if entry is not None:
+            entry["refs"] += 1
+            entry["last_access"] = time.monotonic()
+            return DatasetHandle(key, source)
+
+    # Un seul chargement par clé, même si plusieurs sessions le demandent en même temps
+    with _key_lock(registry, key):
+        with registry["lock"]:
+            entry = registry["entries"].get(key)
+            if entry is not None:
+                entry["refs"] += 1
+                entry["last_access"] = time.monotonic()
+                return DatasetHandle(key, source)
+
+        df = loader()
+        if df is None:
+            return None
+        with registry["lock"]:
+            registry["entries"][key] = {
+                "df": df,
+                "refs": 1,
+                "bytes": _frame_bytes(df),
+                "last_access": time.monotonic(),
+                "path": None,
+            }
+        handle = DatasetHandle(key, source)
+
+    _enforce_budget(keep_key=key)
+    return handle
+
+
+def _rehydrate(key):
+    """Recharge en mémoire un jeu de données déchargé sur disque"""
+    registry = _registry()
+    with _key_lock(registry, key):
+        with registry["lock"]:
+            entry = registry["entries"].get(key)
+            if entry is None:
+                return None
+            if entry["df"] is not None:
+                return entry["df"]
+            path = entry["path"]
+
+        df = table_to_frame(pq.read_table(path, memory_map=True))
+        with registry["lock"]:
+            entry["df"] = df
+            entry["last_access"] = time.monotonic()
+
+    _enforce_budget(keep_key=key)
+    return df
+
+
+def get(handle):
+    """
+    Retourne le jeu de données d'un handle, rechargé depuis le disque s'il avait
+    été déchargé. La copie retournée est superficielle: les colonnes sont
+    partagées et, avec le copy-on-write de pandas (activé à l'import de ce
+    module), une modification par une session copie la colonne modifiée sans
+    toucher au jeu de données partagé.
+    """
+    registry = _registry()
+    with registry["lock"]:
+        entry = registry["entries"].get(handle.key)
+        if entry is None:
+            return None
+        entry["last_access"] = time.monotonic()
+        df = entry["df"]
+
+    if df is None:
+        df = _rehydrate(handle.key)
+        if df is None:
+            return None
+    return df.copy(deep=False)
+
+
+def derived(key, name, build):
+    """
+    Structure dérivée du jeu de données `key` (index, masque de filtre, ordre de tri),
+    construite par `build()` au premier appel puis partagée entre les sessions.
+    Sa taille compte dans MEMORY_BUDGET_BYTES avec celle des jeux de données:
+    les moins récemment utilisés sont libérés en premier. La structure retournée
+    est partagée: elle ne doit pas être modifiée.
+    """
+    registry = _registry()
+    derived_key = (key, name)
+    with registry["lock"]:
+        item = registry["derived"].get(derived_key)
+        if item is not None:
+            item["last_access"] = time.monotonic()
+            return item["value"]
+        building = registry["building"].setdefault(derived_key, threading.Lock())
+
+    # Une seule construction par structure, même si plusieurs sessions la demandent
+    with building:
+        with registry["lock"]:
+            item = registry["derived"].get(derived_key)
+            if item is not None:
+                item["last_access"] = time.monotonic()
+                return item["value"]
+        try:
+            value = build()
+            with registry["lock"]:
+                registry["derived"][derived_key] = {
+                    "value": value,
+                    "bytes": _object_bytes(value),
+                    "last_access": time.monotonic(),
+                }
+        finally:
+            with registry["lock"]:
+                registry["building"].pop(derived_key, None)
+
+    _enforce_budget(keep_key=key, keep_derived=derived_key)
+    return value
+
+
+def clear_derived():
+    """Supprime toutes les structures dérivées (elles seront reconstruites à la demande)"""
+    registry = _registry()
+    with registry["lock"]:
+        registry["derived"].clear()
+
+
+def set_session_dataset(handle):
+    """Associe un jeu de données à la session et libère le précédent"""
+    previous = st.session_state.get(SESSION_KEY)
+    st.session_state[SESSION_KEY] = handle
+    if previous is not None and previous is not handle:
+        previous.close()
+
+
+def clear_session_dataset():
+    """Retire le jeu de données de la session"""
+    previous = st.session_state.pop(SESSION_KEY, None)
+    if previous is not None:
+        previous.close()
+
+
+def set_pending_dataset(future):
+    """
+    Enregistre un chargement en cours pour la session: son handle devient le
+    jeu de données de la session au premier rerun qui suit la fin du chargement,
+    quelle que soit la page affichée.
+    """
+    st.session_state[PENDING_KEY] = future
+
+
+def clear_pending_dataset():
+    """Oublie le chargement en cours de la session (son résultat sera ignoré)"""
+    st.session_state.pop(PENDING_KEY, None)
+
+
+def session_handle():
+    """Retourne le handle du jeu de données de la session, ou None"""
+    pending = st.session_state.get(PENDING_KEY)
+    if pending is not None and pending.done():
+        del st.session_state[PENDING_KEY]
+        if not pending.cancelled() and pending.exception() is None and pending.result() is not None:
+            set_session_dataset(pending.result())
+    return st.session_state.get(SESSION_KEY)
+
+
+def session_dataset():
+    """Retourne le jeu de données de la session, ou None"""
+    handle = session_handle()
+    if handle is None:
+        return None
+    return get(handle)
+
+
+def store_stats():
+    """
+    Nombre de jeux de données partagés et de références, mémoire occupée
+    et taille des jeux de données déchargés sur disque.
+    """
+    registry = _registry()
+    with registry["lock"]:
+        entries = list(registry["entries"].values())
+        derived_bytes = sum(item["bytes"] for item in registry["derived"].values())
+    return {
+        "datasets": len(entries),
+        "references": sum(entry["refs"] for entry in entries),
+        "bytes": sum(entry["bytes"] for entry in entries if entry["df"] is not None),
+        "derived_bytes": derived_bytes,
+        "spilled_bytes": sum(entry["bytes"] for entry in entries if entry["df"] is None),
+    }
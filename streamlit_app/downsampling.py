@@ -0,0 +1,104 @@
+import numpy as np
+
+# Nombre maximal de points envoyés au navigateur pour une courbe
+MAX_LINE_POINTS = 2_000
+# Au-delà de ce nombre de points, un nuage de points passe en rendu WebGL
+MAX_SCATTER_POINTS = 10_000
+# Au-delà de ce nombre de points, un nuage de points est remplacé par une carte de densité
+MAX_SCATTERGL_POINTS = 100_000
+# Nombre de cases par axe de la carte de densité
+DENSITY_BINS = 200
+
+
+def finite_xy(x, y):
+    """Convertit deux colonnes en tableaux float64 et retire les points non finis"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if valid.all():
+        return x, y
+    return x[valid], y[valid]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions des points conservés par Largest-Triangle-Three-Buckets.
+    Le premier et le dernier point sont gardés; entre les deux, chaque tranche
+    garde le point qui forme le plus grand triangle avec le point retenu
+    dans la tranche précédente et la moyenne de la tranche suivante.
+    `x` doit être croissant.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bornes des n_out - 2 tranches intermédiaires (chacune contient au moins un point)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        # Double de l'aire du triangle (a, point candidat, moyenne suivante)
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_line(x, y, max_points=MAX_LINE_POINTS):
+    """
+    Réduit une courbe à au plus `max_points` points par LTTB.
+    Retourne (x, y, réduit) où `réduit` indique si des points ont été retirés.
+    """
+    x, y = finite_xy(x, y)
+    if len(x) <= max_points:
+        return x, y, False
+    kept = lttb_indices(x, y, max_points)
+    return x[kept], y[kept], True
+
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """
+    Histogramme 2D d'un nuage de points: retourne (centres x, centres y, comptes),
+    les comptes étant indexés [y, x] comme attendu par une carte de chaleur.
+    La taille du résultat ne dépend que de `bins`.
+    """
+    x, y = finite_xy(x, y)
+    x_edges = _bin_edges(x, bins)
+    y_edges = _bin_edges(y, bins)
+
+    # Numéro de case de chaque point puis comptage en un seul passage (plus rapide que histogram2d)
+    cells = _bin_numbers(y, y_edges, bins) * bins + _bin_numbers(x, x_edges, bins)
+    counts = np.bincount(cells, minlength=bins * bins).reshape(bins, bins)
+
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return x_centers, y_centers, counts
+
+
+def _bin_edges(values, bins):
+    low, high = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def _bin_numbers(values, edges, bins):
+    """Case de chaque valeur; la borne supérieure appartient à la dernière case"""
+    scale = bins / (edges[-1] - edges[0])
+    numbers = ((values - edges[0]) * scale).astype(np.int64)
+    return np.minimum(numbers, bins - 1, out=numbers)
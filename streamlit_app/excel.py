@@ -0,0 +1,112 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+try:
+    import python_calamine
+except ImportError:  # Dépendance optionnelle: pip install python-calamine
+    python_calamine = None
+
+# Nombre de feuilles lues en parallèle (un processus par feuille)
+EXCEL_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+
+def excel_engine():
+    """Moteur de lecture: calamine (Rust) s'il est installé, sinon openpyxl en lecture seule"""
+    return "calamine" if python_calamine is not None else "openpyxl"
+
+
+@st.cache_data(show_spinner=False)
+def sheet_names(file_id, _file):
+    """Noms des feuilles d'un classeur, sans lire leur contenu"""
+    data = io.BytesIO(_file.getvalue())
+    if python_calamine is not None:
+        return python_calamine.CalamineWorkbook.from_filelike(data).sheet_names
+    workbook = openpyxl.load_workbook(data, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _column_names(header):
+    """Noms de colonnes comme pandas.read_excel: 'Unnamed: i' et suffixes des doublons"""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _read_sheet_openpyxl(data, sheet):
+    """Lit une feuille ligne par ligne avec openpyxl en mode lecture seule (streaming)"""
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        df = pd.DataFrame.from_records(list(rows), columns=_column_names(header))
+    finally:
+        workbook.close()
+    # Les lignes vides (souvent en fin de feuille) sont ignorées, comme avec read_excel
+    return df.dropna(how="all").reset_index(drop=True)
+
+
+def _parse_sheet(data, sheet, engine):
+    """
+    Lit une feuille dans un processus du pool et la retourne sérialisée
+    au format Arrow IPC (transfert plus léger qu'un DataFrame picklé).
+    """
+    if engine == "calamine":
+        df = pd.read_excel(io.BytesIO(data), sheet_name=sheet, engine="calamine")
+    else:
+        df = _read_sheet_openpyxl(data, sheet)
+
+    df.columns = df.columns.astype(str)
+    # Cellules de types mélangés (texte et nombres) dans une même colonne: lues comme texte
+    for col in df.select_dtypes("object").columns:
+        df[col] = df[col].astype("str")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@st.cache_resource
+def _process_pool():
+    """Pool de processus de lecture des classeurs, partagé par toutes les sessions"""
+    # spawn: pas de fork d'un serveur multi-thread
+    return ProcessPoolExecutor(max_workers=EXCEL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def read_sheets(data, sheets):
+    """
+    Lit plusieurs feuilles d'un classeur en parallèle.
+    Génère des tuples (nom de la feuille, table Arrow) dans l'ordre où les
+    feuilles sont lues. Les lectures restantes sont annulées si le générateur
+    est abandonné.
+    """
+    pool = _process_pool()
+    engine = excel_engine()
+    futures = {pool.submit(_parse_sheet, data, sheet, engine): sheet for sheet in sheets}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], pa.ipc.open_stream(future.result()).read_all()
+    finally:
+        for future in futures:
+            future.cancel()
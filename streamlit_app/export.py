@@ -0,0 +1,115 @@
+import hashlib
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import streamlit as st
+from filters import apply_filters
+
+# Formats d'export proposés: extension du fichier et type MIME
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+# Nombre de lignes converties et écrites à la fois
+EXPORT_CHUNK_ROWS = 100_000
+# Dossier des fichiers exportés, réutilisés tant qu'ils existent
+EXPORT_DIR = os.environ.get(
+    "DATASET_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".exports"),
+)
+# Nombre de fichiers d'export conservés: les moins récemment utilisés sont supprimés
+EXPORT_MAX_FILES = 8
+
+
+def dataframe_batches(df, schema):
+    """Découpe un DataFrame en record batches Arrow de EXPORT_CHUNK_ROWS lignes"""
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def write_batches(batches, schema, export_format, path):
+    """
+    Écrit des record batches dans le fichier `path` au format demandé,
+    bloc par bloc: un seul bloc converti est en mémoire à la fois.
+    """
+    if export_format == "Parquet":
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        return
+
+    with pa.OSFile(path, "wb") as sink:
+        stream = sink
+        if export_format == "CSV (gzip)":
+            stream = pa.CompressedOutputStream(sink, "gzip")
+        with pacsv.CSVWriter(stream, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        if stream is not sink:
+            stream.close()
+
+
+def export_path(key, predicates, export_format):
+    """Chemin du fichier d'export d'un état (dataset, filtres, format)"""
+    name = hashlib.blake2b(repr((key, predicates, export_format)).encode(), digest_size=16).hexdigest()
+    return os.path.join(EXPORT_DIR, f"{name}.{EXPORT_FORMATS[export_format][0]}")
+
+
+def _prune(keep_path):
+    """Supprime les fichiers d'export les moins récemment utilisés au-delà de EXPORT_MAX_FILES"""
+    entries = []
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if name.endswith(".tmp") or path == keep_path:
+            continue
+        try:
+            entries.append((os.stat(path).st_mtime, path))
+        except FileNotFoundError:
+            continue
+    for _, path in sorted(entries)[:max(0, len(entries) + 1 - EXPORT_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_export(path, write):
+    """
+    Retourne le chemin du fichier d'export, écrit par `write(chemin)` s'il
+    n'existe pas encore. L'écriture passe par un fichier temporaire: une autre
+    session ne lit jamais un export partiel.
+    """
+    if os.path.exists(path):
+        os.utime(path)  # Export le plus récemment utilisé
+        return path
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with st.spinner("Préparation de l'export..."):
+            write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune(path)
+    return path
+
+
+def export_filtered(key, predicates, export_format, _df, _catalog):
+    """
+    Exporte les lignes filtrées d'un DataFrame dans un fichier de EXPORT_DIR
+    et retourne son chemin. Le fichier n'est généré qu'une fois par
+    (dataset, filtres, format) tant qu'il est conservé.
+    """
+    def write(path):
+        filtered_df = apply_filters(_df, _catalog, list(predicates))
+        schema = pa.Schema.from_pandas(filtered_df, preserve_index=False)
+        write_batches(dataframe_batches(filtered_df, schema), schema, export_format, path)
+
+    return write_export(export_path(key, predicates, export_format), write)
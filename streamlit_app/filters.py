@@ -0,0 +1,127 @@
+import dataset_store
+import numpy as np
+import pandas as pd
+from catalog import datetime_column
+from data_loader import dataset_id
+from indexes import get_index, index_kind, isin_mask, range_mask
+from tracing import span
+
+
+def _compute_mask(series, kind, value):
+    """Évalue un prédicat sur une colonne et retourne un masque booléen NumPy"""
+    if kind == "isin":
+        mask = series.isin(value)
+    elif kind == "range":
+        low, high = value
+        mask = (series >= low) & (series <= high)
+    elif kind == "date_range":
+        start, end = value
+        mask = (series >= pd.Timestamp(start)) & (series < pd.Timestamp(end) + pd.Timedelta(days=1))
+    else:
+        raise ValueError(f"Type de filtre inconnu: {kind}")
+
+    return mask.to_numpy(dtype=bool, na_value=False)
+
+
+def _indexed_mask(index, n_rows, kind, value):
+    """Évalue un prédicat à partir de l'index de la colonne (voir index_kind), ou retourne None"""
+    if kind == "isin":
+        return isin_mask(index, n_rows, value)
+    if kind == "range":
+        low, high = value
+        return range_mask(index, n_rows, low, high)
+    if kind == "date_range":
+        start, end = value
+        return range_mask(
+            index, n_rows,
+            pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1),
+            high_inclusive=False,
+        )
+    return None
+
+
+def _predicate_mask(dataset_key, column, kind, value, series):
+    """
+    Masque d'un prédicat, compacté en bits (np.packbits, un octet pour 8 lignes)
+    et mis en cache par (dataset, colonne, prédicat) dans le registre: sa taille
+    compte dans le budget mémoire des jeux de données (dataset_store.derived).
+    Utilise l'index de la colonne, construit au premier prédicat actif sur cette
+    colonne, sinon parcourt la colonne.
+    Le masque est partagé entre les reruns: il est rendu non modifiable.
+    """
+    def build():
+        mask = None
+        index = get_index(dataset_key, column, index_kind(kind), series)
+        if index is not None:
+            mask = _indexed_mask(index, len(series), kind, value)
+        if mask is None:
+            mask = _compute_mask(series, kind, value)
+        packed = np.packbits(mask)
+        packed.flags.writeable = False
+        return packed
+
+    return dataset_store.derived(dataset_key, ("mask", column, kind, value), build)
+
+
+def _covers_column(info, kind, value):
+    """Indique si un intervalle contient [min, max] d'une colonne sans valeur manquante"""
+    if info["null_count"] or info["min"] is None:
+        return False
+    low, high = value
+    if kind == "date_range":
+        return low <= info["min"].date() and high >= info["max"].date()
+    return low <= info["min"] and high >= info["max"]
+
+
+def active_predicates(catalog, predicates):
+    """
+    Retire les prédicats qui ne filtrent rien: sur une colonne catégorielle,
+    une sélection vide ou contenant toutes les valeurs; sur une colonne numérique
+    ou de dates sans valeur manquante, un intervalle couvrant toutes les valeurs.
+    """
+    active = []
+    for kind, column, value in predicates:
+        info = catalog[column]
+        values = info["values"]
+        if kind == "isin" and values is not None and len(value) in (0, len(values)):
+            continue
+        if kind in ("range", "date_range") and _covers_column(info, kind, value):
+            continue
+        active.append((kind, column, value))
+    return active
+
+
+def filter_mask(df, catalog, predicates):
+    """
+    Combine les masques des prédicats par un ET vectorisé sur leurs bits.
+    Les index ne sont construits que pour les colonnes filtrées.
+    `predicates` est une liste de tuples (type, colonne, valeur) avec les types
+    "isin", "range" et "date_range". Retourne None si aucun prédicat ne filtre.
+    """
+    key = dataset_id(df)
+    packed = None
+
+    for kind, column, value in active_predicates(catalog, predicates):
+        if kind == "date_range":
+            series = datetime_column(catalog, df, column)
+        else:
+            series = df[column]
+
+        predicate_mask = _predicate_mask(key, column, kind, value, series)
+        if packed is None:
+            packed = predicate_mask.copy()
+        else:
+            np.bitwise_and(packed, predicate_mask, out=packed)
+
+    if packed is None:
+        return None
+    return np.unpackbits(packed, count=len(df)).view(bool)
+
+
+def apply_filters(df, catalog, predicates):
+    """Retourne les lignes qui vérifient tous les prédicats, matérialisées une seule fois"""
+    with span("filters", rows=len(df)):
+        mask = filter_mask(df, catalog, predicates)
+        if mask is None:
+            return df
+        return df[mask]
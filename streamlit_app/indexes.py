@@ -0,0 +1,127 @@
+import dataset_store
+import numpy as np
+import pandas as pd
+
+# En dessous de ce nombre de lignes, un parcours complet est plus rapide qu'un index
+INDEX_MIN_ROWS = 100_000
+# Nombre maximal de valeurs distinctes pour construire un index par valeur
+INDEX_MAX_DISTINCT = 64
+# Au-delà de cette part de lignes sélectionnées, comparer la colonne reste plus rapide
+RANGE_INDEX_MAX_SELECTIVITY = 0.2
+
+
+def _row_ids_dtype(n_rows):
+    return np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+
+
+def build_sorted_index(series):
+    """
+    Index trié d'une colonne numérique ou de dates: permutation qui trie
+    les valeurs, valeurs triées et nombre de valeurs non manquantes
+    (les valeurs manquantes sont rangées à la fin).
+    """
+    values = series.to_numpy()
+    order = np.argsort(values, kind="stable").astype(_row_ids_dtype(len(values)))
+
+    # Valeurs triées en 64 bits pour comparer les bornes sans conversion du tableau
+    sorted_values = values[order]
+    if np.issubdtype(sorted_values.dtype, np.integer):
+        sorted_values = sorted_values.astype(np.int64)
+    elif np.issubdtype(sorted_values.dtype, np.floating):
+        sorted_values = sorted_values.astype(np.float64)
+
+    return {
+        "kind": "sorted",
+        "order": order,
+        "values": sorted_values,
+        "n_valid": int(len(values) - series.isna().sum()),
+    }
+
+
+def build_value_index(series):
+    """
+    Index par valeur d'une colonne peu variée: positions des lignes
+    pour chaque valeur distincte, et positions des valeurs manquantes.
+    Retourne None au-delà de INDEX_MAX_DISTINCT valeurs distinctes.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if len(uniques) > INDEX_MAX_DISTINCT:
+        return None
+    order = np.argsort(codes, kind="stable").astype(_row_ids_dtype(len(codes)))
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+    bounds = np.cumsum(counts)
+
+    # Les lignes manquantes (code -1) sont en tête de la permutation
+    rows = {}
+    for i, value in enumerate(uniques):
+        rows[value] = order[bounds[i]:bounds[i + 1]]
+    return {"kind": "values", "rows": rows, "null_rows": order[:bounds[0]]}
+
+
+def index_kind(predicate_kind):
+    """Type d'index utile à un type de prédicat: par valeur pour "isin", trié sinon"""
+    return "values" if predicate_kind == "isin" else "sorted"
+
+
+def build_index(series, kind):
+    """
+    Index `kind` ("values" ou "sorted") d'une colonne, ou None si la colonne
+    est trop courte ou ne s'y prête pas
+    """
+    if len(series) < INDEX_MIN_ROWS:
+        return None
+    if kind == "values":
+        return build_value_index(series)
+    # Index trié: types NumPy numériques et dates sans fuseau horaire seulement
+    if not isinstance(series.dtype, np.dtype) or series.dtype.kind not in "iufM":
+        return None
+    return build_sorted_index(series)
+
+
+def get_index(dataset_id, column, kind, series):
+    """
+    Index d'une colonne, construit au premier prédicat actif qui l'utilise puis
+    partagé entre les sessions. Sa taille compte dans le budget mémoire du
+    registre (dataset_store.derived): il est libéré avec les moins récemment utilisés.
+    """
+    return dataset_store.derived(dataset_id, ("index", column, kind), lambda: build_index(series, kind))
+
+
+def _coerce_bound(dtype, bound, round_up):
+    """Convertit une borne dans le type des valeurs indexées"""
+    if np.issubdtype(dtype, np.datetime64):
+        return pd.Timestamp(bound).to_datetime64().astype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return int(np.ceil(bound) if round_up else np.floor(bound))
+    return float(bound)
+
+
+def range_mask(index, n_rows, low, high, high_inclusive=True):
+    """
+    Masque des lignes dont la valeur est dans [low, high] par recherche dichotomique.
+    Retourne None si l'intervalle sélectionne trop de lignes pour que l'index soit utile.
+    """
+    values = index["values"][:index["n_valid"]]
+    low = _coerce_bound(values.dtype, low, round_up=True)
+    high = _coerce_bound(values.dtype, high, round_up=False)
+    start = np.searchsorted(values, low, side="left")
+    end = np.searchsorted(values, high, side="right" if high_inclusive else "left")
+    if end - start > RANGE_INDEX_MAX_SELECTIVITY * n_rows:
+        return None
+
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[index["order"][start:end]] = True
+    return mask
+
+
+def isin_mask(index, n_rows, selected):
+    """Masque des lignes dont la valeur est sélectionnée, par union des listes de lignes"""
+    mask = np.zeros(n_rows, dtype=bool)
+    for value in selected:
+        if pd.isna(value):
+            rows = index["null_rows"]
+        else:
+            rows = index["rows"].get(value)
+        if rows is not None:
+            mask[rows] = True
+    return mask
@@ -0,0 +1,125 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from data_loader import load_data, normalize_dtypes, upload_source
+from dataset_store import clear_pending_dataset, set_pending_dataset
+
+# Nombre de fichiers chargés en parallèle (toutes sessions confondues)
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", 2))
+# Intervalle de rafraîchissement de la progression, en secondes
+PROGRESS_INTERVAL = 0.5
+# Nombre de lignes de l'aperçu affiché dès le premier bloc lu
+PREVIEW_ROWS = 5
+
+# Clé de session du chargement en cours
+JOB_KEY = "ingestion_job"
+
+
+class IngestionCancelled(Exception):
+    """Levée dans le thread de chargement quand le chargement est annulé"""
+
+
+@st.cache_resource
+def _executor():
+    """Pool de threads de chargement partagé par toutes les sessions"""
+    return ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="ingestion")
+
+
+def _ingest(job, file, sheet):
+    """Charge le fichier dans un thread du pool en mettant à jour l'état du job"""
+    def progress(fraction, chunk):
+        if job["cancel"].is_set():
+            raise IngestionCancelled()
+        job["progress"] = fraction
+        job["rows"] += chunk.num_rows
+        if job["preview"] is None and len(chunk):
+            job["preview"] = normalize_dtypes(chunk.slice(0, PREVIEW_ROWS).to_pandas())
+
+    return load_data(file, progress=progress, sheet=sheet)
+
+
+def current_job():
+    """Retourne le chargement en cours de la session, ou None"""
+    return st.session_state.get(JOB_KEY)
+
+
+def start_ingestion(file, sheet=None):
+    """
+    Lance le chargement d'un fichier (et de la feuille `sheet` d'un classeur Excel)
+    en arrière-plan et annule celui en cours.
+    Le jeu de données devient celui de la session à la fin du chargement.
+    """
+    cancel_ingestion()
+    job = {
+        "source": upload_source(file, sheet),
+        "name": file.name,
+        "progress": 0.0,
+        "rows": 0,
+        "preview": None,
+        "cancel": threading.Event(),
+    }
+    job["future"] = _executor().submit(_ingest, job, file, sheet)
+    st.session_state[JOB_KEY] = job
+    set_pending_dataset(job["future"])
+    return job
+
+
+def cancel_ingestion():
+    """Annule le chargement en cours de la session (s'il y en a un)"""
+    job = st.session_state.pop(JOB_KEY, None)
+    if job is not None:
+        job["cancel"].set()
+        job["future"].cancel()
+        clear_pending_dataset()
+
+
+@st.fragment(run_every=PROGRESS_INTERVAL)
+def _progress():
+    job = current_job()
+    if job is None:
+        return
+    if job["future"].done():
+        # Rerun complet: toutes les sections affichent le jeu de données chargé
+        st.rerun()
+
+    st.progress(job["progress"], text=f"Chargement de {job['name']}... {job['rows']:,} lignes")
+    if st.button("Annuler le chargement"):
+        cancel_ingestion()
+        st.rerun()
+
+
+def ingestion_status():
+    """
+    Affiche la progression du chargement en cours, rafraîchie sans rerun complet,
+    ou l'erreur du chargement terminé. Retourne True si un chargement est en cours.
+    """
+    job = current_job()
+    if job is None:
+        return False
+
+    future = job["future"]
+    if not future.done():
+        _progress()
+        return True
+
+    if not future.cancelled() and future.exception() is not None:
+        # Le job en échec reste en session: le même fichier n'est pas relancé à chaque rerun
+        st.error(f"Erreur: {future.exception()}")
+    else:
+        del st.session_state[JOB_KEY]
+    return False
+
+
+@st.fragment(run_every=PROGRESS_INTERVAL)
+def ingestion_preview():
+    """Aperçu des premières lignes lues, affiché avant la fin du chargement"""
+    job = current_job()
+    if job is None or job["future"].done():
+        return
+    if job["preview"] is None:
+        st.info(f"Lecture de {job['name']}...")
+    else:
+        st.dataframe(job["preview"])
+        st.caption(f"{job['rows']:,} lignes lues, chargement en cours")
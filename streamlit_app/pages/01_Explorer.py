@@ -1,77 +1,87 @@
 import streamlit as st
-import pandas as pd
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from utils import describe_data, add_logo
+from catalog import get_catalog
+from cube import cube_aggregates, get_cube
+from data_loader import dataset_id
+from dataset_store import session_dataset
+from export import EXPORT_FORMATS, export_filtered
+from filters import active_predicates, apply_filters, filter_mask
+from query import duckdb_available, get_sql_catalog, query_aggregates, query_export, query_rows, query_summary, source_key, sql_source
+from static_assets import load_css
+from tracing import debug_panel, span, start_rerun, traced_fragment
+from utils import describe_data, paginated_dataframe, sort_page
 
 # Configuration de la page
 st.set_page_config(page_title="Explorer", page_icon="🔍")
+start_rerun("Explorer")
 
-# Chargement des CSS
-def load_css():
-    import os
-    css_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets", "css", "style.css")
-    try:
-        with open(css_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    except FileNotFoundError:
-        pass  # CSS optionnel
-
+# Feuille de style et logo (construits une fois par processus)
 load_css()
-add_logo()
 
 st.markdown("""
 <h1>🔍 <span>Explorer les Données</span></h1>
 """, unsafe_allow_html=True)
 
-# Vérifier si des données sont chargées
-if "data" in st.session_state:
-    df = st.session_state["data"]
-    
-    # Description des données
+# Chaque panneau est un fragment: un widget ne relance que le panneau qui le contient
+# (et les panneaux imbriqués), les calculs coûteux étant mis en cache par jeu de données
+
+
+@st.fragment
+@traced_fragment("Explorer")
+def stats_panel(source, in_memory):
+    """Statistiques générales, calculées une fois par jeu de données"""
     with st.expander("📊 Statistiques générales", expanded=True):
-        describe_data(df)
-        st.dataframe(df.describe())
-    
-    # Filtres avancés
+        if in_memory:
+            describe_data(source, statistics=True)
+        else:
+            st.dataframe(query_summary(source_key(source), source))
+
+
+def filter_widgets(catalog):
+    """Affiche les filtres (bornes et valeurs issues du catalogue) et retourne les prédicats"""
     st.subheader("🔍 Filtres avancés")
+    predicates = []
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # Filtres pour les variables catégorielles
-        categorical_cols = df.select_dtypes(include=['object', 'bool']).columns
+        # Filtres pour les variables catégorielles (valeurs issues du catalogue)
+        categorical_cols = [
+            col for col, info in catalog.items()
+            if info["semantic"] in ("categorical", "boolean")
+        ]
         
         if len(categorical_cols) > 0:
             st.markdown("**Filtres catégoriels**")
-            filters = {}
             
             for col in categorical_cols:
-                if col not in ['date']:  # Exclure les colonnes de dates
-                    unique_vals = df[col].unique()
-                    if len(unique_vals) <= 20:  # Limiter aux colonnes avec peu de valeurs uniques
-                        selected_vals = st.multiselect(
-                            f"{col.replace('_', ' ').title()}",
-                            unique_vals,
-                            default=unique_vals,
-                            key=f"filter_{col}"
-                        )
-                        filters[col] = selected_vals
+                unique_vals = catalog[col]["values"]
+                if unique_vals is not None:  # Limiter aux colonnes avec peu de valeurs uniques
+                    selected_vals = st.multiselect(
+                        f"{col.replace('_', ' ').title()}",
+                        unique_vals,
+                        default=unique_vals,
+                        key=f"filter_{col}"
+                    )
+                    predicates.append(("isin", col, tuple(selected_vals)))
     
     with col2:
-        # Filtres pour les variables numériques
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
+        # Filtres pour les variables numériques (bornes issues du catalogue)
+        numeric_cols = [
+            col for col, info in catalog.items()
+            if info["semantic"] == "numeric"
+        ]
         
         if len(numeric_cols) > 0:
             st.markdown("**Filtres numériques**")
-            numeric_filters = {}
             
             for col in numeric_cols:
-                if col not in ['month']:  # Traiter le mois séparément
-                    min_val = float(df[col].min())
-                    max_val = float(df[col].max())
+                if col not in ['month'] and catalog[col]["min"] is not None:  # Traiter le mois séparément
+                    min_val = float(catalog[col]["min"])
+                    max_val = float(catalog[col]["max"])
                     
                     if min_val != max_val:
                         selected_range = st.slider(
@@ -81,18 +91,17 @@ if "data" in st.session_state:
                             (min_val, max_val),
                             key=f"slider_{col}"
                         )
-                        numeric_filters[col] = selected_range
+                        predicates.append(("range", col, tuple(selected_range)))
     
     # Filtres spéciaux
     st.markdown("**Filtres spéciaux**")
     col3, col4 = st.columns(2)
     
     with col3:
-        # Filtre par période si date disponible
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
-            min_date = df['date'].min().date()
-            max_date = df['date'].max().date()
+        # Filtre par période si date disponible (colonne convertie par le catalogue)
+        if 'date' in catalog and catalog['date']["semantic"] == "datetime" and catalog['date']["min"] is not None:
+            min_date = catalog['date']["min"].date()
+            max_date = catalog['date']["max"].date()
             
             date_range = st.date_input(
                 "Période",
@@ -101,10 +110,12 @@ if "data" in st.session_state:
                 max_value=max_date,
                 key="date_filter"
             )
+            if len(date_range) == 2:
+                predicates.append(("date_range", 'date', tuple(date_range)))
     
     with col4:
         # Filtre par mois si disponible
-        if 'month' in df.columns:
+        if 'month' in catalog:
             months = ["Jan", "Fév", "Mar", "Avr", "Mai", "Jun", 
                      "Jul", "Aoû", "Sep", "Oct", "Nov", "Déc"]
             selected_months = st.multiselect(
@@ -114,70 +125,158 @@ if "data" in st.session_state:
                 format_func=lambda x: months[x-1],
                 key="month_filter"
             )
+            predicates.append(("isin", 'month', tuple(selected_months)))
     
-    # Appliquer les filtres
-    filtered_df = df.copy()
-    
-    # Filtres catégoriels
-    if 'filters' in locals():
-        for col, values in filters.items():
-            if values:
-                filtered_df = filtered_df[filtered_df[col].isin(values)]
-    
-    # Filtres numériques
-    if 'numeric_filters' in locals():
-        for col, (min_val, max_val) in numeric_filters.items():
-            filtered_df = filtered_df[
-                (filtered_df[col] >= min_val) & (filtered_df[col] <= max_val)
-            ]
-    
-    # Filtre par date
-    if 'date_range' in locals() and len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (filtered_df['date'].dt.date >= start_date) & 
-            (filtered_df['date'].dt.date <= end_date)
-        ]
+    return predicates
+
+
+@st.fragment
+@traced_fragment("Explorer")
+def results_table(n_rows, columns, fetch_page):
+    """Tableau paginé: le tri et le changement de page ne relancent que ce fragment"""
+    paginated_dataframe(n_rows, columns, fetch_page, key="results")
+
+
+@st.fragment
+@traced_fragment("Explorer")
+def export_panel(export_state, source, catalog, use_sql):
+    """
+    Export des lignes filtrées, généré seulement à la demande dans un fichier réutilisé.
+    `export_state` est l'état sans le format: (clé du jeu de données, prédicats).
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox("Format d'export", list(EXPORT_FORMATS), key="export_format")
+    export_state = (*export_state, export_format)
+    
+    with col2:
+        if st.button("Préparer l'export", key="export_prepare"):
+            st.session_state["export_state"] = export_state
     
-    # Filtre par mois
-    if 'selected_months' in locals():
-        filtered_df = filtered_df[filtered_df['month'].isin(selected_months)]
+    if st.session_state.get("export_state") == export_state:
+        if use_sql:
+            export_file = query_export(*export_state, source)
+        else:
+            export_file = export_filtered(*export_state, source, catalog)
+        extension, mime = EXPORT_FORMATS[export_format]
+        # Le fichier est écrit sur disque; il n'est lu que pour être servi au bouton
+        with open(export_file, "rb") as f:
+            st.download_button(
+                label=f"📥 Télécharger les données filtrées ({export_format})",
+                data=f,
+                file_name=f'donnees_filtrees.{extension}',
+                mime=mime
+            )
+
+
+@st.fragment
+@traced_fragment("Explorer")
+def filter_panel(source, catalog, use_sql):
+    """
+    Filtres et résultats: un filtre modifié relance ce fragment (indicateurs,
+    tableau, export) sans recalculer les statistiques générales
+    """
+    predicates = filter_widgets(catalog)
+    
+    # Indicateurs calculés sur les lignes filtrées
+    kpi_aggregates = [
+        ("total_sales", "sum", "total_sales"),
+        ("customer_satisfaction", "avg", "customer_satisfaction"),
+        ("quantity", "sum", "quantity"),
+    ]
+    kpi_aggregates = [aggregate for aggregate in kpi_aggregates if aggregate[2] in catalog]
+    
+    if use_sql:
+        # Filtres traduits en SQL: seuls les indicateurs et la page affichée sont renvoyés
+        key = source_key(source)
+        source = sql_source(source, catalog)
+        sql_predicates = active_predicates(catalog, predicates)
+        kpis = query_aggregates(key, sql_predicates, [("rows", "count", None)] + kpi_aggregates, source)
+        export_state = (key, tuple(sql_predicates))
+        
+        def fetch_page(start, stop, sort_col, ascending):
+            return query_rows(key, sql_predicates, stop - start, source, start, sort_col, ascending)
+    else:
+        # Appliquer les filtres: un masque par prédicat, mis en cache, combinés en une seule sélection
+        df = source
+        filtered_df = apply_filters(df, catalog, predicates)
+        export_state = (dataset_id(df), tuple(active_predicates(catalog, predicates)))
+        
+        # Indicateurs lus dans le cube d'agrégats si les filtres ne portent que sur ses dimensions,
+        # sinon calculés sur les lignes filtrées
+        with span("kpis", rows=len(filtered_df)):
+            cube = get_cube(dataset_id(df), df, catalog)
+            kpis = cube_aggregates(cube, active_predicates(catalog, predicates), [("rows", "count", None)] + kpi_aggregates)
+            if kpis is None:
+                kpis = {"rows": len(filtered_df)}
+                for name, func, col in kpi_aggregates:
+                    kpis[name] = filtered_df[col].mean() if func == "avg" else filtered_df[col].sum()
+        
+        def fetch_page(start, stop, sort_col, ascending):
+            # Ordre de tri calculé sur tout le jeu de données, restreint aux lignes filtrées
+            return sort_page(df, start, stop, sort_col, ascending, filter_mask(df, catalog, predicates))
     
     # Affichage des résultats
-    st.subheader(f"📋 Données filtrées ({len(filtered_df)} lignes)")
+    st.subheader(f"📋 Données filtrées ({kpis['rows']} lignes)")
     
-    if len(filtered_df) > 0:
+    if kpis["rows"] > 0:
         # Statistiques du dataset filtré
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Nombre de lignes", len(filtered_df))
+            st.metric("Nombre de lignes", kpis["rows"])
         
         with col2:
-            if 'total_sales' in filtered_df.columns:
-                st.metric("Total des ventes", f"${filtered_df['total_sales'].sum():,.2f}")
+            if 'total_sales' in kpis:
+                st.metric("Total des ventes", f"${kpis['total_sales']:,.2f}")
         
         with col3:
-            if 'customer_satisfaction' in filtered_df.columns:
-                st.metric("Satisfaction moyenne", f"{filtered_df['customer_satisfaction'].mean():.1f}/5")
+            if 'customer_satisfaction' in kpis:
+                st.metric("Satisfaction moyenne", f"{kpis['customer_satisfaction']:.1f}/5")
         
         with col4:
-            if 'quantity' in filtered_df.columns:
-                st.metric("Quantité totale", f"{filtered_df['quantity'].sum():,}")
+            if 'quantity' in kpis:
+                st.metric("Quantité totale", f"{int(kpis['quantity']):,}")
         
-        # Tableau des données
-        st.dataframe(filtered_df)
+        # Tableau des données, paginé: seule la page affichée est envoyée au navigateur
+        results_table(kpis["rows"], list(catalog), fetch_page)
         
         # Option de téléchargement
-        csv = filtered_df.to_csv(index=False)
-        st.download_button(
-            label="📥 Télécharger les données filtrées (CSV)",
-            data=csv,
-            file_name='donnees_filtrees.csv',
-            mime='text/csv'
-        )
+        export_panel(export_state, source, catalog, use_sql)
     else:
         st.warning("Aucune donnée ne correspond aux filtres sélectionnés.")
+
+
+# Source des données: DataFrame chargé en session, ou fichier de data/ interrogé par DuckDB
+source = session_dataset()
+if source is None and "data_path" in st.session_state and duckdb_available():
+    source = st.session_state["data_path"]
+
+# Vérifier si des données sont chargées
+if source is not None:
+    in_memory = not isinstance(source, str)
+    
+    # Moteur de requête: pandas pour les données en mémoire, DuckDB en option
+    use_sql = not in_memory
+    if in_memory and duckdb_available():
+        use_sql = st.sidebar.toggle(
+            "Moteur DuckDB",
+            key="use_duckdb",
+            help="Exécute les filtres et les indicateurs en SQL avec DuckDB"
+        )
+    
+    if in_memory:
+        catalog = get_catalog(dataset_id(source), source)
+    else:
+        catalog = get_sql_catalog(source_key(source), source)
+    
+    # Description des données
+    stats_panel(source, in_memory)
+    
+    # Filtres avancés et résultats
+    filter_panel(source, catalog, use_sql)
         
 else:
     st.warning("Aucune donnée chargée. Retournez à la page d'accueil.")
+
+debug_panel()
@@ -1,140 +1,171 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import sys
 import os
+import sys
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from utils import add_logo
+from aggregations import (
+    AGGREGATIONS,
+    HISTOGRAM_BIN_RULES,
+    TIME_BUCKETS,
+    get_group_aggregate,
+    get_histogram,
+)
+from catalog import datetime_column, get_catalog
+from data_loader import dataset_id
+from dataset_store import session_dataset
+from static_assets import load_css
+from tracing import debug_panel, span, start_rerun, traced_fragment
+from visualizations import (
+    clean_dataframe_for_plotly,
+    get_line_figure,
+    get_scatter_figure,
+)
 
 # Configuration de la page
 st.set_page_config(page_title="Visualiser", page_icon="📊")
+start_rerun("Visualiser")
 
-# Chargement des CSS
-def load_css():
-    import os
-    css_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets", "css", "style.css")
-    try:
-        with open(css_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    except FileNotFoundError:
-        pass  # CSS optionnel
-
+# Feuille de style et logo (construits une fois par processus)
 load_css()
-add_logo()
-
-def clean_dataframe_for_plotly(df):
-    """Nettoie un DataFrame pour qu'il soit compatible avec Plotly"""
-    if df is None:
-        return None
-    
-    # Créer une copie pour éviter de modifier l'original
-    clean_df = df.copy()
-    
-    # Convertir les types nullable pandas vers des types standard
-    for col in clean_df.columns:
-        col_type_str = str(clean_df[col].dtype)
-        if col_type_str in ['Int64', 'Int32', 'Int16', 'Int8']:
-            clean_df[col] = clean_df[col].astype('int64')
-        elif col_type_str in ['Float64', 'Float32']:
-            clean_df[col] = clean_df[col].astype('float64')
-        elif clean_df[col].dtype == 'object':
-            try:
-                clean_df[col] = clean_df[col].astype('str')
-            except:
-                pass
-    
-    return clean_df
 
 st.markdown("""
 <h1>📊 <span>Visualiser les Données</span></h1>
 """, unsafe_allow_html=True)
 
-# Vérifier si des données sont chargées
-if "data" in st.session_state:
-    df = clean_dataframe_for_plotly(st.session_state["data"])
-    
+
+@st.fragment
+@traced_fragment("Visualiser")
+def chart_panel(df, catalog):
+    """
+    Graphique et ses options: un changement d'option ne relance que ce fragment,
+    les agrégats et histogrammes étant mis en cache par jeu de données
+    """
     # Options de visualisation simples
     chart_type = st.selectbox(
         "Type de graphique",
         ["Barres", "Ligne", "Dispersion", "Histogramme"]
     )
-    
+
     # Sélection des colonnes
-    numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns
-    
+    numeric_cols = df.select_dtypes(include="number").columns
+
     if len(numeric_cols) > 0:
         y_axis = st.selectbox("Axe Y", numeric_cols)
-        
+
         # Différents types de graphiques avec Plotly
         if chart_type == "Barres":
-            if len(df) <= 100:  # Limiter pour la lisibilité
-                # Créer un DataFrame avec index explicite pour éviter les conflits
-                plot_df = df.reset_index()
-                plot_df['row_index'] = plot_df.index
-                
-                fig = px.bar(
-                    plot_df, 
-                    x='row_index', 
-                    y=y_axis,
-                    title=f"Graphique en barres - {y_axis}",
-                    template="plotly_white"
+            # Agrégation par catégorie ou par période, calculée côté serveur
+            group_cols = [
+                col for col, info in catalog.items()
+                if info["semantic"] in ("categorical", "boolean", "datetime")
+            ]
+            if group_cols:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    group_col = st.selectbox("Regrouper par", group_cols)
+                with col2:
+                    agg_label = st.selectbox("Agrégation", list(AGGREGATIONS))
+                freq = None
+                if catalog[group_col]["semantic"] == "datetime":
+                    with col3:
+                        bucket_label = st.selectbox("Période", list(TIME_BUCKETS), index=2)
+                    freq = TIME_BUCKETS[bucket_label]
+                    keys = datetime_column(catalog, df, group_col)
+                else:
+                    keys = df[group_col]
+
+                grouped = get_group_aggregate(
+                    dataset_id(df), group_col, freq, y_axis, AGGREGATIONS[agg_label],
+                    keys, df[y_axis]
                 )
-                fig.update_layout(height=500, showlegend=False)
-                fig.update_xaxes(title="Index")
-                st.plotly_chart(fig, use_container_width=True)
+                x_values = grouped.index if freq else grouped.index.astype(str)
+                fig = go.Figure(go.Bar(x=x_values, y=grouped.to_numpy()))
+                fig.update_layout(
+                    title=f"{agg_label} de {y_axis} par {group_col}",
+                    template="plotly_white",
+                    height=500,
+                    showlegend=False
+                )
+                fig.update_xaxes(title=group_col)
+                fig.update_yaxes(title=f"{agg_label} de {y_axis}")
+                with span("st.plotly_chart"):
+                    st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"{len(grouped):,} groupes calculés sur {len(df):,} lignes")
             else:
-                st.warning("Trop de données pour un graphique à barres lisible (>100 lignes)")
-        
+                st.warning("Aucune colonne catégorielle ou de dates pour regrouper les données")
+
         elif chart_type == "Ligne":
-            # Créer un DataFrame avec index explicite pour éviter les conflits
-            plot_df = df.reset_index()
-            plot_df['row_index'] = plot_df.index
-            
-            fig = px.line(
-                plot_df, 
-                x='row_index', 
-                y=y_axis,
-                title=f"Graphique en ligne - {y_axis}",
-                template="plotly_white"
+            # Courbe en fonction de l'index des lignes, réduite par LTTB si nécessaire
+            fig, note = get_line_figure(
+                dataset_id(df), y_axis, np.arange(len(df)), df[y_axis],
+                f"Graphique en ligne - {y_axis}", "Index", y_axis
             )
             fig.update_layout(height=500, showlegend=False)
-            fig.update_xaxes(title="Index")
-            st.plotly_chart(fig, use_container_width=True)
-        
+            with span("st.plotly_chart"):
+                st.plotly_chart(fig, use_container_width=True)
+            if note:
+                st.caption(note)
+
         elif chart_type == "Histogramme":
-            fig = px.histogram(
-                df, 
-                x=y_axis,
+            # Classes calculées côté serveur: seuls les comptes sont envoyés au navigateur
+            rule_label = st.selectbox("Règle de découpage", list(HISTOGRAM_BIN_RULES))
+            counts, edges = get_histogram(
+                dataset_id(df), y_axis, HISTOGRAM_BIN_RULES[rule_label], df[y_axis]
+            )
+            fig = go.Figure(go.Bar(
+                x=(edges[:-1] + edges[1:]) / 2,
+                y=counts,
+                width=np.diff(edges)
+            ))
+            fig.update_layout(
                 title=f"Histogramme - {y_axis}",
-                template="plotly_white"
+                template="plotly_white",
+                height=500,
+                showlegend=False,
+                bargap=0
             )
-            fig.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-        
+            fig.update_xaxes(title=y_axis)
+            fig.update_yaxes(title="Nombre")
+            with span("st.plotly_chart"):
+                st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"{len(counts):,} classes calculées sur {int(counts.sum()):,} valeurs")
+
         elif chart_type == "Dispersion":
             if len(numeric_cols) >= 2:
                 # S'assurer que l'axe X est différent de l'axe Y par défaut
                 default_x_index = 0 if y_axis != numeric_cols[0] else 1
                 x_axis = st.selectbox("Axe X", numeric_cols, index=default_x_index)
-                
+
                 # Vérifier que x et y sont différents
                 if x_axis == y_axis:
                     st.warning("⚠️ Veuillez sélectionner des axes différents pour créer un graphique significatif.")
                 else:
-                    fig = px.scatter(
-                        df, 
-                        x=x_axis, 
-                        y=y_axis,
-                        title=f"Dispersion - {y_axis} vs {x_axis}",
-                        template="plotly_white"
+                    fig, note = get_scatter_figure(
+                        dataset_id(df), x_axis, y_axis, df[x_axis], df[y_axis],
+                        f"Dispersion - {y_axis} vs {x_axis}", x_axis, y_axis
                     )
                     fig.update_layout(height=500, showlegend=False)
-                    st.plotly_chart(fig, use_container_width=True)
+                    with span("st.plotly_chart"):
+                        st.plotly_chart(fig, use_container_width=True)
+                    if note:
+                        st.caption(note)
             else:
                 st.warning("Besoin d'au moins 2 colonnes numériques")
     else:
         st.warning("Aucune colonne numérique détectée")
+
+
+# Vérifier si des données sont chargées
+df = session_dataset()
+if df is not None:
+    df = clean_dataframe_for_plotly(df)
+    catalog = get_catalog(dataset_id(df), df)
+    chart_panel(df, catalog)
 else:
     st.warning("Aucune donnée chargée. Retournez à la page d'accueil.")
+
+debug_panel()
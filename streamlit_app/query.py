@@ -0,0 +1,249 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as pads
+import streamlit as st
+from catalog import CATALOG_MAX_DISTINCT
+from data_loader import dataset_id, normalize_dtypes
+from export import EXPORT_CHUNK_ROWS, export_path, write_batches, write_export
+
+try:
+    import duckdb
+except ImportError:  # Dépendance optionnelle: pip install duckdb
+    duckdb = None
+
+# Nombre de résultats de requêtes conservés par fonction (tous datasets confondus)
+QUERY_CACHE_ENTRIES = 64
+
+_NUMERIC_TYPES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT",
+    "FLOAT", "DOUBLE", "DECIMAL",
+)
+
+
+def duckdb_available():
+    """Indique si le moteur DuckDB est installé"""
+    return duckdb is not None
+
+
+@st.cache_resource
+def _connection():
+    return duckdb.connect()
+
+
+def _quote(identifier):
+    """Échappe un nom de colonne pour SQL"""
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _sql_value(value):
+    """Convertit les scalaires NumPy en types Python acceptés par DuckDB"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def source_key(source):
+    """Clé de cache d'une source: chemin et date de modification, ou identifiant du dataset"""
+    if isinstance(source, str):
+        return f"{source}:{os.path.getmtime(source)}"
+    return dataset_id(source)
+
+
+def sql_source(source, catalog):
+    """
+    Source exposée à DuckDB. Pour un DataFrame, les colonnes texte reconnues comme
+    dates par le catalogue sont remplacées par leurs dates converties (jour/mois/année
+    compris): DuckDB filtre et trie alors les mêmes dates que pandas.
+    """
+    if isinstance(source, str):
+        return source
+    parsed = {col: info["parsed"] for col, info in catalog.items() if info["parsed"] is not None}
+    if not parsed:
+        return source
+    # Copie superficielle: seules les colonnes converties sont remplacées
+    return source.assign(**parsed)
+
+
+def _from_clause(cursor, source):
+    """
+    Retourne la clause FROM d'une source et ses paramètres.
+    Les fichiers Parquet et CSV sont lus directement par DuckDB (projection et
+    filtres poussés jusqu'au fichier); les fichiers Feather/Arrow et les
+    DataFrames sont exposés comme vue sans copie.
+    """
+    if isinstance(source, str):
+        name = source.lower()
+        if name.endswith(".parquet"):
+            return "read_parquet(?)", [source]
+        if name.endswith(".csv"):
+            return "read_csv(?)", [source]
+        cursor.register("dataset", pads.dataset(source, format="ipc"))
+        return "dataset", []
+
+    cursor.register("dataset", source)
+    return "dataset", []
+
+
+def compile_predicates(predicates):
+    """
+    Traduit les prédicats du moteur de filtres (type, colonne, valeur)
+    en clause WHERE paramétrée.
+    """
+    clauses = []
+    params = []
+
+    for kind, column, value in predicates:
+        col = _quote(column)
+        if kind == "isin":
+            values = [_sql_value(v) for v in value if not pd.isna(v)]
+            parts = []
+            if values:
+                parts.append(f"{col} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            if len(values) < len(value):
+                parts.append(f"{col} IS NULL")
+            clauses.append("(" + " OR ".join(parts) + ")" if parts else "FALSE")
+        elif kind == "range":
+            low, high = value
+            clauses.append(f"{col} BETWEEN ? AND ?")
+            params.extend([float(low), float(high)])
+        elif kind == "date_range":
+            start, end = value
+            clauses.append(f"TRY_CAST({col} AS TIMESTAMP) >= ? AND TRY_CAST({col} AS TIMESTAMP) < ?")
+            params.extend([
+                pd.Timestamp(start).to_pydatetime(),
+                (pd.Timestamp(end) + pd.Timedelta(days=1)).to_pydatetime(),
+            ])
+        else:
+            raise ValueError(f"Type de filtre inconnu: {kind}")
+
+    return " AND ".join(clauses) or "TRUE", params
+
+
+def _execute(source, sql, params=()):
+    """Exécute une requête sur la source; `{source}` est remplacé par la clause FROM"""
+    cursor = _connection().cursor()
+    try:
+        from_sql, from_params = _from_clause(cursor, source)
+        return cursor.execute(sql.replace("{source}", from_sql), from_params + list(params)).df()
+    finally:
+        cursor.close()
+
+
+@st.cache_data(show_spinner=False, max_entries=QUERY_CACHE_ENTRIES)
+def query_aggregates(key, predicates, aggregates, _source):
+    """
+    Calcule des agrégats sur les lignes filtrées.
+    `aggregates` est une liste de tuples (nom, fonction SQL, colonne ou None pour *).
+    Retourne un dictionnaire nom -> valeur.
+    """
+    where, params = compile_predicates(predicates)
+    select = ", ".join(
+        f"{func}({_quote(col) if col else '*'}) AS {_quote(name)}"
+        for name, func, col in aggregates
+    )
+    result = _execute(_source, f"SELECT {select} FROM {{source}} WHERE {where}", params)
+    return result.to_dict("records")[0]
+
+
+@st.cache_data(show_spinner=False, max_entries=QUERY_CACHE_ENTRIES)
+def query_rows(key, predicates, limit, _source, offset=0, order_by=None, ascending=True):
+    """Retourne une page de `limit` lignes filtrées, triée par DuckDB si `order_by` est donné"""
+    where, params = compile_predicates(predicates)
+    order = ""
+    if order_by is not None:
+        order = f"ORDER BY {_quote(order_by)} {'ASC' if ascending else 'DESC'} NULLS LAST"
+    df = _execute(
+        _source,
+        f"SELECT * FROM {{source}} WHERE {where} {order} LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    )
+    return normalize_dtypes(df)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def query_summary(key, _source):
+    """Statistiques descriptives de chaque colonne, calculées par DuckDB"""
+    return _execute(_source, "SUMMARIZE SELECT * FROM {source}")
+
+
+def _semantic(column_type):
+    if column_type == "BOOLEAN":
+        return "boolean"
+    if column_type.startswith(_NUMERIC_TYPES):
+        return "numeric"
+    if column_type.startswith(("DATE", "TIMESTAMP")):
+        return "datetime"
+    return "text"
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_sql_catalog(key, _source):
+    """
+    Catalogue des colonnes (même structure que catalog.build_catalog)
+    calculé par DuckDB en un passage, sans charger les données.
+    """
+    schema = _execute(_source, "DESCRIBE SELECT * FROM {source}")
+    semantics = dict(zip(schema["column_name"], schema["column_type"].map(_semantic)))
+
+    # Valeurs manquantes et bornes de toutes les colonnes en une seule requête
+    select = []
+    for col, semantic in semantics.items():
+        select.append(f"count(*) - count({_quote(col)}) AS {_quote(col + '__nulls')}")
+        if semantic in ("numeric", "datetime"):
+            select.append(f"min({_quote(col)}) AS {_quote(col + '__min')}")
+            select.append(f"max({_quote(col)}) AS {_quote(col + '__max')}")
+    stats = _execute(_source, f"SELECT {', '.join(select)} FROM {{source}}").iloc[0]
+
+    catalog = {}
+    for col, column_type in zip(schema["column_name"], schema["column_type"]):
+        info = {
+            "dtype": column_type,
+            "null_count": int(stats[f"{col}__nulls"]),
+            "semantic": semantics[col],
+            "min": None,
+            "max": None,
+            "n_unique": None,
+            "values": None,
+            "parsed": None,
+        }
+        if info["semantic"] in ("numeric", "datetime"):
+            if not pd.isna(stats[f"{col}__min"]):
+                convert = pd.Timestamp if info["semantic"] == "datetime" else _sql_value
+                info["min"] = convert(stats[f"{col}__min"])
+                info["max"] = convert(stats[f"{col}__max"])
+        else:
+            distinct = _execute(
+                _source,
+                f"SELECT DISTINCT {_quote(col)} AS value FROM {{source}} ORDER BY 1 LIMIT ?",
+                [CATALOG_MAX_DISTINCT + 1],
+            )["value"]
+            if len(distinct) <= CATALOG_MAX_DISTINCT:
+                info["n_unique"] = len(distinct)
+                info["values"] = [None if pd.isna(v) else _sql_value(v) for v in distinct]
+                if info["semantic"] == "text":
+                    info["semantic"] = "categorical"
+        catalog[col] = info
+    return catalog
+
+
+def query_export(key, predicates, export_format, _source):
+    """
+    Exporte les lignes filtrées par DuckDB dans un fichier de EXPORT_DIR et
+    retourne son chemin: le résultat est lu par record batches et écrit au
+    fur et à mesure, sans être chargé dans pandas.
+    """
+    def write(path):
+        where, params = compile_predicates(predicates)
+        cursor = _connection().cursor()
+        try:
+            from_sql, from_params = _from_clause(cursor, _source)
+            reader = cursor.execute(
+                f"SELECT * FROM {from_sql} WHERE {where}", from_params + params
+            ).fetch_record_batch(EXPORT_CHUNK_ROWS)
+            write_batches(reader, reader.schema, export_format, path)
+        finally:
+            cursor.close()
+
+    return write_export(export_path(key, predicates, export_format), write)
@@ -0,0 +1,104 @@
+import base64
+import hashlib
+import os
+import re
+
+import streamlit as st
+
+# Feuille de style de l'application
+CSS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "css", "style.css")
+# Dossier servi par Streamlit sous STATIC_URL (server.enableStaticServing dans .streamlit/config.toml)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+LOGO_FILE = "logo.png"
+APP_TITLE = "Streamlit App Template"
+
+_COMMENTS = re.compile(r"/\*.*?\*/", re.DOTALL)
+_STRINGS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+
+# Logo et titre au-dessus du menu de navigation de la sidebar
+_SIDEBAR_CSS = """
+[data-testid="stSidebarNav"] {{
+    {logo}
+}}
+[data-testid="stSidebarNav"]::before {{
+    content: "{title}";
+    display: block;
+    text-align: center;
+    font-family: var(--font-title);
+    font-weight: 600;
+    color: var(--text-primary);
+    font-size: 1.5rem;
+    margin-top: {margin_top};
+    margin-bottom: 10px;
+    background: linear-gradient(135deg, #9A6BFF 0%, #F254A4 100%);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    background-clip: text;
+}}
+"""
+_LOGO_CSS = """
+    background-image: url({url});
+    background-repeat: no-repeat;
+    padding-top: 240px;
+    background-position: center 20px;
+    background-size: 150px;
+"""
+
+
+def minify_css(css):
+    """Retire les commentaires et les espaces superflus; les chaînes sont conservées telles quelles"""
+    parts = _STRINGS.split(_COMMENTS.sub("", css))
+    # Les indices pairs sont hors des chaînes
+    for i in range(0, len(parts), 2):
+        text = re.sub(r"\s+", " ", parts[i])
+        text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+        text = re.sub(r":\s+", ":", text)
+        parts[i] = text.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def fingerprint(data):
+    """Empreinte courte d'un contenu, pour versionner son URL"""
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _logo_url():
+    """URL du logo servi en fichier statique, ou None s'il n'y a pas de logo"""
+    path = os.path.join(STATIC_DIR, LOGO_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if st.get_option("server.enableStaticServing"):
+        # L'empreinte change avec le fichier: le navigateur peut le garder en cache
+        return f"{STATIC_URL}/{LOGO_FILE}?v={fingerprint(data)}"
+    # Service des fichiers statiques désactivé: le logo est intégré à la feuille de style
+    return f"data:image/png;base64,{base64.b64encode(data).decode()}"
+
+
+@st.cache_resource(show_spinner=False)
+def stylesheet():
+    """
+    Balise <style> de l'application, construite une fois par processus:
+    style.css et le bandeau de la sidebar, minifiés et versionnés par leur empreinte
+    """
+    try:
+        with open(CSS_PATH) as f:
+            css = f.read()
+    except FileNotFoundError:
+        css = ""  # CSS optionnel
+
+    logo_url = _logo_url()
+    css += _SIDEBAR_CSS.format(
+        logo=_LOGO_CSS.format(url=logo_url) if logo_url else "padding-top: 80px;",
+        title=APP_TITLE,
+        margin_top="10px" if logo_url else "20px",
+    )
+    css = minify_css(css)
+    return f'<style id="style-{fingerprint(css.encode())}">{css}</style>'
+
+
+def load_css():
+    """Ajoute la feuille de style et le logo à la page (sans lecture de fichier après le premier appel)"""
+    st.markdown(stylesheet(), unsafe_allow_html=True)
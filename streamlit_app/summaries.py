@@ -0,0 +1,300 @@
+import base64
+import json
+
+import dataset_cache
+import numpy as np
+import pandas as pd
+import streamlit as st
+from tracing import span
+
+# Nombre de lignes résumées à la fois (les résumés des blocs sont ensuite fusionnés)
+SUMMARY_CHUNK_ROWS = 1_000_000
+# Compression du t-digest: environ TDIGEST_DELTA / 2 centroïdes par colonne
+TDIGEST_DELTA = 200
+# Précision du HyperLogLog: 2**HLL_PRECISION registres, erreur relative ~ 1.04 / sqrt(2**p)
+HLL_PRECISION = 12
+# Quantiles affichés dans les tableaux descriptifs, comme describe()
+DESCRIBE_PERCENTILES = (0.25, 0.5, 0.75)
+
+
+class TDigest:
+    """
+    Résumé des quantiles d'une distribution (t-digest): des centroïdes (moyenne, poids)
+    d'autant plus fins qu'ils sont proches des extrémités. Deux t-digests se
+    fusionnent en regroupant leurs centroïdes.
+    """
+
+    def __init__(self, delta=TDIGEST_DELTA):
+        self.delta = delta
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, values):
+        """Ajoute des valeurs finies (tableau numpy) au résumé"""
+        # Les valeurs sont d'abord regroupées seules (tri simple), puis fusionnées
+        chunk = TDigest(self.delta)
+        chunk._compress(np.sort(values), np.ones(len(values)), presorted=True)
+        self.merge(chunk)
+
+    def merge(self, other):
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _compress(self, means, weights, presorted=False):
+        if len(means) == 0:
+            return
+        if not presorted:
+            order = np.argsort(means, kind="stable")
+            means, weights = means[order], weights[order]
+
+        # Échelle k1: un centroïde par unité de k, plus étroits aux extrémités
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.delta / (2 * np.pi) * np.arcsin(2 * q - 1)
+        buckets = np.floor(k).astype(np.int64)
+        buckets -= buckets[0]
+
+        merged_weights = np.bincount(buckets, weights=weights)
+        merged_sums = np.bincount(buckets, weights=weights * means)
+        keep = merged_weights > 0
+        self.weights = merged_weights[keep]
+        self.means = merged_sums[keep] / self.weights
+
+    def quantile(self, q, minimum, maximum):
+        """Quantile approché, interpolé entre les centroïdes et borné par le min et le max"""
+        if len(self.weights) == 0:
+            return np.nan
+        total = self.weights.sum()
+        positions = np.concatenate([[0.0], np.cumsum(self.weights) - self.weights / 2, [total]])
+        values = np.concatenate([[minimum], self.means, [maximum]])
+        return float(np.interp(q * total, positions, values))
+
+    def to_dict(self):
+        return {"delta": self.delta, "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["delta"])
+        digest.means = np.array(data["means"], dtype=np.float64)
+        digest.weights = np.array(data["weights"], dtype=np.float64)
+        return digest
+
+
+class HyperLogLog:
+    """
+    Estimation du nombre de valeurs distinctes (HyperLogLog) sur des empreintes 64 bits.
+    Deux estimateurs se fusionnent en gardant le maximum de chaque registre.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        if precision < 11:
+            raise ValueError(f"Précision du HyperLogLog inférieure à 11: {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """Ajoute des empreintes (tableau uint64)"""
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        # Les p bits de poids fort choisissent le registre, le rang se lit sur les autres
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+
+        # Rang = nombre de zéros en tête des 64 - p bits restants + 1, d'après la longueur
+        # en bits de `rest` (exposant de frexp, exact en float64 car 64 - p <= 53)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        ranks = (64 - p + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = np.count_nonzero(self.registers == 0)
+        # Petits effectifs: comptage linéaire des registres vides
+        if estimate <= 2.5 * m and empty > 0:
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {"precision": self.precision, "registers": base64.b64encode(self.registers.tobytes()).decode()}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data["precision"])
+        hll.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return hll
+
+
+class ColumnSummary:
+    """
+    Résumé d'une colonne calculé en un passage: effectif, valeurs manquantes,
+    valeurs distinctes (HyperLogLog) et, pour les colonnes numériques, moyenne,
+    variance, min, max et quantiles (t-digest). Les résumés de blocs ou de
+    partitions d'une même colonne se fusionnent avec `merge`.
+    """
+
+    def __init__(self, numeric):
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.digest = TDigest() if numeric else None
+        self.distinct = HyperLogLog()
+
+    @classmethod
+    def of(cls, series):
+        """Résumé d'une colonne (ou d'un bloc de colonne)"""
+        summary = cls(_is_numeric(series))
+        valid = series.notna().to_numpy()
+        summary.count = int(valid.sum())
+        summary.nulls = len(series) - summary.count
+        summary.distinct.update(
+            pd.util.hash_pandas_object(series[valid], index=False).to_numpy()
+        )
+
+        if summary.numeric and summary.count:
+            values = series.to_numpy(dtype="float64", na_value=np.nan)[valid]
+            summary.mean = float(values.mean())
+            summary.m2 = float(np.square(values - summary.mean).sum())
+            summary.min = float(values.min())
+            summary.max = float(values.max())
+            summary.digest.update(values[np.isfinite(values)])
+        return summary
+
+    def merge(self, other):
+        """Fusionne le résumé d'un autre bloc de la même colonne (variance par la formule de Chan)"""
+        if self.numeric and other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.min = np.fmin(self.min, other.min)
+            self.max = np.fmax(self.max, other.max)
+            self.digest.merge(other.digest)
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        return self
+
+    @property
+    def std(self):
+        """Écart type de l'échantillon (ddof=1), comme describe()"""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    def quantile(self, q):
+        return self.digest.quantile(q, self.min, self.max)
+
+    def to_dict(self):
+        return {
+            "numeric": self.numeric,
+            "count": self.count,
+            "nulls": self.nulls,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": float(self.min),
+            "max": float(self.max),
+            "digest": self.digest.to_dict() if self.digest is not None else None,
+            "distinct": self.distinct.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data["numeric"])
+        for name in ("count", "nulls", "mean", "m2", "min", "max"):
+            setattr(summary, name, data[name])
+        if data["digest"] is not None:
+            summary.digest = TDigest.from_dict(data["digest"])
+        summary.distinct = HyperLogLog.from_dict(data["distinct"])
+        return summary
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def summarize_frame(df):
+    """Résumés des colonnes d'un DataFrame (ou d'un bloc): colonne -> ColumnSummary"""
+    return {col: ColumnSummary.of(df[col]) for col in df.columns}
+
+
+def merge_summaries(summaries, other):
+    """Fusionne les résumés d'un autre bloc ou d'une autre partition dans `summaries`"""
+    for col, summary in other.items():
+        if col in summaries:
+            summaries[col].merge(summary)
+        else:
+            summaries[col] = summary
+    return summaries
+
+
+def summarize(df, chunk_rows=SUMMARY_CHUNK_ROWS):
+    """Résume un DataFrame bloc par bloc, en un seul passage sur les données"""
+    summaries = summarize_frame(df.iloc[:chunk_rows])
+    for start in range(chunk_rows, len(df), chunk_rows):
+        merge_summaries(summaries, summarize_frame(df.iloc[start:start + chunk_rows]))
+    return summaries
+
+
+def summaries_to_json(summaries):
+    """Sérialise les résumés (conservés avec le jeu de données dans le cache disque)"""
+    return json.dumps({col: summary.to_dict() for col, summary in summaries.items()})
+
+
+def summaries_from_json(text):
+    return {col: ColumnSummary.from_dict(data) for col, data in json.loads(text).items()}
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_summary(dataset_id, _df):
+    """
+    Résumés des colonnes du jeu de données, calculés une fois par jeu de données
+    (au chargement, voir data_loader) et partagés entre les sessions.
+    Les résumés enregistrés dans le cache disque avec le jeu de données sont relus
+    sans repasser sur les données.
+    """
+    with span("summaries", rows=len(_df)) as record:
+        stored = dataset_cache.get_summaries(dataset_id)
+        if stored is not None:
+            record["rows"] = 0
+            return summaries_from_json(stored)
+        return summarize(_df)
+
+
+def describe_table(summaries, columns=None):
+    """Tableau des statistiques des colonnes numériques, au format de describe()"""
+    columns = [
+        col for col in (summaries if columns is None else columns)
+        if summaries[col].numeric
+    ]
+    rows = {}
+    for col in columns:
+        summary = summaries[col]
+        rows[col] = {
+            "count": float(summary.count),
+            "mean": summary.mean if summary.count else np.nan,
+            "std": summary.std,
+            "min": summary.min,
+            **{f"{q:.0%}": summary.quantile(q) for q in DESCRIBE_PERCENTILES},
+            "max": summary.max,
+        }
+    return pd.DataFrame(rows, columns=columns)
+
+
+def null_counts(summaries):
+    """Nombre de valeurs manquantes par colonne"""
+    return pd.Series({col: summary.nulls for col, summary in summaries.items()}, dtype="int64")
+
+
+def distinct_counts(summaries):
+    """Nombre approché de valeurs distinctes par colonne (HyperLogLog)"""
+    return pd.Series({col: summary.distinct.estimate() for col, summary in summaries.items()}, dtype="int64")
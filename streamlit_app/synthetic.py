@@ -0,0 +1,124 @@
+"""
+Générateur du jeu de données synthétique de ventes e-commerce.
+
+Usage: python streamlit_app/synthetic.py --rows 10000000 --output data/ventes.parquet
+"""
+import argparse
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Catégories de produits et régions, avec leurs fréquences
+CATEGORIES = ["Electronics", "Fashion", "Home", "Sports", "Books", "Beauty", "Toys"]
+CATEGORY_WEIGHTS = [0.25, 0.20, 0.15, 0.12, 0.10, 0.10, 0.08]
+REGIONS = ["North America", "Europe", "Asia", "South America", "Africa", "Oceania"]
+REGION_WEIGHTS = [0.35, 0.25, 0.20, 0.10, 0.06, 0.04]
+
+# Période couverte par les ventes: les HISTORY_DAYS derniers jours
+HISTORY_DAYS = 730
+# Bornes du nombre de lignes
+MIN_ROWS = 1_000
+MAX_ROWS = 100_000_000
+# Lignes générées par bloc (mémoire bornée, un row group Parquet par bloc)
+SYNTHETIC_CHUNK_ROWS = 1_000_000
+
+
+def _generate_chunk(n_rows, rng, start_date):
+    """Génère un bloc de ventes, entièrement vectorisé (dates en datetime64)"""
+    days = rng.integers(0, HISTORY_DAYS, n_rows)
+    dates = (start_date + days.astype("timedelta64[D]")).astype("datetime64[us]")
+    # Jour de la semaine: le 1er janvier 1970 était un jeudi (lundi = 0)
+    day_of_week = (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    month = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+
+    price = rng.lognormal(3, 0.8, n_rows).round(2)
+    quantity = rng.poisson(2, n_rows) + 1
+    discount_rate = rng.beta(2, 8, n_rows).round(3)
+
+    return pd.DataFrame({
+        "date": dates,
+        "category": pd.Categorical.from_codes(
+            rng.choice(len(CATEGORIES), n_rows, p=CATEGORY_WEIGHTS).astype(np.int8), CATEGORIES
+        ),
+        "region": pd.Categorical.from_codes(
+            rng.choice(len(REGIONS), n_rows, p=REGION_WEIGHTS).astype(np.int8), REGIONS
+        ),
+        "price": price,
+        "quantity": quantity.astype(np.int16),
+        "customer_age": rng.normal(35, 12, n_rows).astype(np.int64).clip(18, 80).astype(np.int8),
+        "discount_rate": discount_rate,
+        "shipping_cost": rng.gamma(2, 5, n_rows).round(2),
+        "customer_satisfaction": rng.normal(4.2, 0.6, n_rows).round(1).clip(1, 5),
+        "is_premium": rng.random(n_rows) < 0.3,
+        "total_sales": (price * quantity * (1 - discount_rate)).round(2),
+        "month": month.astype(np.int8),
+        "is_weekend": day_of_week >= 5,
+    })
+
+
+def generate_chunks(n_rows, seed=42, chunk_rows=SYNTHETIC_CHUNK_ROWS, end_date=None):
+    """
+    Génère `n_rows` ventes bloc par bloc (DataFrames d'au plus `chunk_rows` lignes).
+    Chaque bloc a sa propre graine dérivée de `seed`: le résultat est identique
+    d'une exécution à l'autre pour la même graine, la même taille de bloc et
+    la même date de fin (par défaut aujourd'hui).
+    """
+    if not MIN_ROWS <= n_rows <= MAX_ROWS:
+        raise ValueError(f"Nombre de lignes hors bornes: {n_rows} (de {MIN_ROWS:,} à {MAX_ROWS:,})")
+    start_date = np.datetime64(end_date or date.today(), "D") - HISTORY_DAYS
+
+    for index, start in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+        yield _generate_chunk(min(chunk_rows, n_rows - start), rng, start_date)
+
+
+def generate(n_rows, seed=42, chunk_rows=SYNTHETIC_CHUNK_ROWS, end_date=None):
+    """Génère le jeu de données complet en mémoire"""
+    return pd.concat(
+        generate_chunks(n_rows, seed, chunk_rows, end_date), ignore_index=True
+    )
+
+
+def write_parquet(path, n_rows, seed=42, chunk_rows=SYNTHETIC_CHUNK_ROWS, end_date=None):
+    """
+    Écrit le jeu de données dans un fichier Parquet, un row group par bloc:
+    la mémoire utilisée ne dépend que de `chunk_rows`. Retourne le chemin.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    writer = None
+    try:
+        for chunk in generate_chunks(n_rows, seed, chunk_rows, end_date):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=SYNTHETIC_CHUNK_ROWS)
+    parser.add_argument("--output", default=os.path.join("data", "ventes.parquet"))
+    args = parser.parse_args()
+
+    path = write_parquet(args.output, args.rows, args.seed, args.chunk_rows)
+    print(f"{args.rows:,} lignes écrites dans {path} ({os.path.getsize(path) / 1024**2:.1f} Mo)")
+
+
+if __name__ == "__main__":
+    main()
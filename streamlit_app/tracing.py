@@ -0,0 +1,293 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Fichier des métriques agrégées: texte Prometheus, ou JSON lines si l'extension est .jsonl
+# (chaîne vide: pas d'export)
+METRICS_FILE = os.environ.get(
+    "TRACING_METRICS_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".metrics", "metrics.prom"),
+)
+# Intervalle minimal entre deux écritures du fichier de métriques, en secondes
+METRICS_INTERVAL = 10
+# Nombre de reruns conservés par page dans le panneau de débogage
+TRACE_HISTORY = int(os.environ.get("TRACING_HISTORY", 20))
+# Panneau de débogage affiché pour toutes les sessions (sinon avec ?debug=1 dans l'URL)
+DEBUG_PANEL = os.environ.get("DEBUG_PANEL", "") == "1"
+# Bornes des classes de l'histogramme des durées, en secondes
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Clé de session de l'historique des reruns (page -> derniers reruns)
+HISTORY_KEY = "traces"
+
+# Suivi des allocations Python/NumPy (coûteux): activé par TRACING_TRACEMALLOC=1
+if os.environ.get("TRACING_TRACEMALLOC") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Rerun en cours dans le thread du script; les spans des autres threads
+# (chargements en arrière-plan) ne sont comptés que dans les métriques agrégées
+_current = contextvars.ContextVar("trace", default=None)
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_last_flush = [0.0]
+
+# Mesures de pic mémoire des spans ouverts (tous threads): le pic de tracemalloc est
+# global, il est reporté sur chacune avant d'être remis à zéro par un nouveau span
+_open_peaks = {}
+_peaks_lock = threading.Lock()
+_peak_ids = itertools.count()
+
+
+def _collect_traced_peak():
+    """Reporte le pic de tracemalloc sur les spans ouverts (sous _peaks_lock)"""
+    peak = tracemalloc.get_traced_memory()[1]
+    for state in _open_peaks.values():
+        state["traced_peak"] = max(state["traced_peak"], peak)
+
+
+def _start_peak():
+    """
+    Ouvre la mesure du pic mémoire d'un span. Les compteurs d'Arrow et de
+    tracemalloc sont globaux: le pic comprend les allocations des autres sessions.
+    """
+    state = {"arrow_start": pa.total_allocated_bytes(), "arrow_max": pa.default_memory_pool().max_memory()}
+    with _peaks_lock:
+        if tracemalloc.is_tracing():
+            _collect_traced_peak()
+            tracemalloc.reset_peak()
+            state["traced_start"] = state["traced_peak"] = tracemalloc.get_traced_memory()[0]
+        peak_id = next(_peak_ids)
+        _open_peaks[peak_id] = state
+    return peak_id
+
+
+def _end_peak(peak_id):
+    """Ferme la mesure et retourne le pic en octets au-dessus de la mémoire du début du span"""
+    with _peaks_lock:
+        if tracemalloc.is_tracing():
+            _collect_traced_peak()
+        state = _open_peaks.pop(peak_id)
+
+    # Le pic d'Arrow ne peut pas être remis à zéro: il n'est connu que s'il a été
+    # dépassé pendant l'étape, sinon la mémoire de fin d'étape en est la borne basse
+    arrow_max = pa.default_memory_pool().max_memory()
+    if arrow_max > state["arrow_max"]:
+        arrow_peak = arrow_max
+    else:
+        arrow_peak = pa.total_allocated_bytes()
+    peak = max(0, arrow_peak - state["arrow_start"])
+    if "traced_start" in state:
+        peak += max(0, state["traced_peak"] - state["traced_start"])
+    return peak
+
+
+def _aggregate(record):
+    with _metrics_lock:
+        metric = _metrics.setdefault(record["name"], {
+            "count": 0,
+            "sum": 0.0,
+            "buckets": [0] * len(DURATION_BUCKETS),
+            "rows": 0,
+            "peak_bytes": 0,
+        })
+        metric["count"] += 1
+        metric["sum"] += record["seconds"]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if record["seconds"] <= bound:
+                metric["buckets"][i] += 1
+        metric["rows"] += record["rows"] or 0
+        metric["peak_bytes"] = max(metric["peak_bytes"], record["bytes"] or 0)
+
+
+@contextmanager
+def span(name, rows=None):
+    """
+    Mesure une étape: durée, pic mémoire et lignes traitées.
+    Le pic (`bytes`) est la mémoire maximale du processus pendant l'étape, au-dessus
+    de celle du début: il comprend les allocations temporaires libérées avant la fin
+    de l'étape, et celles des autres sessions et des chargements concurrents.
+    Le dictionnaire retourné peut être complété dans le bloc (`rows`, `bytes`).
+    """
+    record = {"name": name, "rows": rows, "bytes": None}
+    peak_id = _start_peak()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        peak = _end_peak(peak_id)
+        if record["bytes"] is None:
+            record["bytes"] = peak
+        _aggregate(record)
+        trace = _current.get()
+        if trace is not None:
+            trace["spans"].append(record)
+
+
+def traced(name):
+    """Décorateur: chaque appel de la fonction est mesuré dans un span `name`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_fragment(page):
+    """
+    Décorateur des fragments de la page `page` (sous @st.fragment): un rerun du seul
+    fragment est tracé comme un rerun de la page, sous le nom du fragment, et ses
+    métriques sont exportées. Pendant un rerun complet, ou dans un fragment parent,
+    le fragment fait partie de la trace en cours.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ctx = get_script_run_ctx()
+            trace = _current.get()
+            fragment_run = ctx is not None and bool(ctx.fragment_ids_this_run)
+            if not fragment_run or (trace is not None and trace["fragment"] is not None):
+                return func(*args, **kwargs)
+            start_rerun(page, fragment=func.__name__)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _end_rerun()
+                flush_metrics()
+        return wrapper
+    return decorator
+
+
+def start_rerun(page, fragment=None):
+    """
+    Démarre la trace du rerun d'une page (à appeler en tête de page),
+    ou du rerun du seul fragment `fragment` (voir traced_fragment)
+    """
+    _current.set({
+        "page": page,
+        "fragment": fragment,
+        "started": datetime.now(),
+        "start": time.perf_counter(),
+        "spans": [],
+    })
+
+
+def _end_rerun():
+    """Termine la trace du rerun en cours et l'ajoute à l'historique de la session"""
+    trace = _current.get()
+    if trace is None:
+        return None
+    _current.set(None)
+    trace["seconds"] = time.perf_counter() - trace.pop("start")
+    history = st.session_state.setdefault(HISTORY_KEY, {})
+    history.setdefault(trace["page"], deque(maxlen=TRACE_HISTORY)).append(trace)
+    return trace
+
+
+def _prometheus_text(metrics):
+    lines = [
+        "# HELP streamlit_app_span_seconds Durée des étapes instrumentées",
+        "# TYPE streamlit_app_span_seconds histogram",
+    ]
+    for name, metric in sorted(metrics.items()):
+        for bound, count in zip(DURATION_BUCKETS, metric["buckets"]):
+            lines.append(f'streamlit_app_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'streamlit_app_span_seconds_bucket{{span="{name}",le="+Inf"}} {metric["count"]}')
+        lines.append(f'streamlit_app_span_seconds_sum{{span="{name}"}} {metric["sum"]:.6f}')
+        lines.append(f'streamlit_app_span_seconds_count{{span="{name}"}} {metric["count"]}')
+    for metric_name, field, help_text in (
+        ("streamlit_app_span_rows_total", "rows", "Lignes traitées par les étapes instrumentées"),
+        ("streamlit_app_span_peak_bytes", "peak_bytes",
+         "Plus haut pic mémoire du processus (toutes sessions) pendant une étape instrumentée"),
+    ):
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {'counter' if metric_name.endswith('_total') else 'gauge'}")
+        for name, metric in sorted(metrics.items()):
+            lines.append(f'{metric_name}{{span="{name}"}} {metric[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def flush_metrics(force=False):
+    """
+    Écrit les métriques agrégées dans METRICS_FILE, au plus toutes les
+    METRICS_INTERVAL secondes. Le texte Prometheus est réécrit en entier;
+    en JSON lines, un instantané par étape est ajouté à chaque écriture.
+    """
+    now = time.monotonic()
+    if not METRICS_FILE or (not force and now - _last_flush[0] < METRICS_INTERVAL):
+        return
+    _last_flush[0] = now
+    with _metrics_lock:
+        metrics = json.loads(json.dumps(_metrics))
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+        if METRICS_FILE.endswith(".jsonl"):
+            timestamp = datetime.now().isoformat(timespec="seconds")
+            with open(METRICS_FILE, "a") as f:
+                for name, metric in sorted(metrics.items()):
+                    f.write(json.dumps({"timestamp": timestamp, "span": name, **metric,
+                                        "bounds": DURATION_BUCKETS}) + "\n")
+        else:
+            # Écriture atomique: l'agent de collecte ne lit jamais un fichier partiel
+            tmp_path = f"{METRICS_FILE}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(_prometheus_text(metrics))
+            os.replace(tmp_path, METRICS_FILE)
+    except OSError:
+        pass  # Les métriques sont une aide au diagnostic: une erreur d'écriture est ignorée
+
+
+def debug_panel():
+    """
+    Termine la trace du rerun (à appeler en fin de page), exporte les métriques
+    et affiche, si le débogage est activé, les derniers reruns de la page dans la sidebar
+    """
+    trace = _end_rerun()
+    flush_metrics()
+    if trace is None or not (DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+
+    history = st.session_state[HISTORY_KEY][trace["page"]]
+    with st.sidebar.expander("🐞 Débogage: reruns", expanded=False):
+        st.caption(f"Dernier rerun: {trace['seconds'] * 1000:.1f} ms")
+        # Compteurs d'allocation globaux: une session ne peut pas être isolée des autres
+        scope = "Pic mémoire de tout le processus pendant l'étape, autres sessions comprises"
+        if not tracemalloc.is_tracing():
+            scope += "; mémoire Arrow seulement (TRACING_TRACEMALLOC=1 pour NumPy et pandas)"
+        st.caption(scope)
+        if trace["spans"]:
+            st.dataframe(pd.DataFrame({
+                "Étape": [record["name"] for record in trace["spans"]],
+                "Durée (ms)": [round(record["seconds"] * 1000, 1) for record in trace["spans"]],
+                "Lignes": [record["rows"] for record in trace["spans"]],
+                "Pic mémoire (octets, processus)": [record["bytes"] for record in trace["spans"]],
+            }), hide_index=True)
+
+        st.caption(f"{len(history)} derniers reruns de la page")
+        st.dataframe(pd.DataFrame({
+            "Heure": [item["started"].strftime("%H:%M:%S") for item in reversed(history)],
+            "Fragment": [item["fragment"] or "page entière" for item in reversed(history)],
+            "Durée (ms)": [round(item["seconds"] * 1000, 1) for item in reversed(history)],
+            "Étapes": [len(item["spans"]) for item in reversed(history)],
+            "Étape la plus lente": [
+                max(item["spans"], key=lambda record: record["seconds"])["name"] if item["spans"] else None
+                for item in reversed(history)
+            ],
+        }), hide_index=True)
@@ -1,120 +1,162 @@
-import streamlit as st
+import dataset_store
+import numpy as np
 import pandas as pd
-import os
+import streamlit as st
+from data_loader import MEMORY_REPORT_ATTR, dataset_id, ensure_normalized
+from summaries import describe_table, distinct_counts, get_summary, null_counts
+from tracing import span
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_description(dataset_key, _df):
+    """
+    Tableaux descriptifs d'un jeu de données (types, mémoire, valeurs distinctes,
+    valeurs manquantes, statistiques), construits à partir des résumés calculés
+    au chargement: les données ne sont pas relues
+    """
+    summaries = get_summary(dataset_key, _df)
+    memory = _df.memory_usage(index=False, deep=True)
+    distinct = distinct_counts(summaries)
+    report = _df.attrs.get(MEMORY_REPORT_ATTR)
+    if report:
+        # Gain apporté par l'optimisation des types au chargement
+        before = pd.Series({col: report[col][0] for col in _df.columns if col in report})
+        types = pd.DataFrame({
+            "Type": _df.dtypes.astype(str),
+            "Valeurs distinctes (approx.)": distinct,
+            "Mémoire avant (Ko)": (before / 1024).round(1),
+            "Mémoire après (Ko)": (memory / 1024).round(1),
+        })
+        total = f"Mémoire totale: {before.sum() / 1024**2:.1f} Mo → {memory.sum() / 1024**2:.1f} Mo"
+    else:
+        types = pd.DataFrame({
+            "Type": _df.dtypes.astype(str),
+            "Valeurs distinctes (approx.)": distinct,
+            "Mémoire (Ko)": (memory / 1024).round(1),
+        })
+        total = None
+
+    missing = null_counts(summaries)
+    return {
+        "shape": _df.shape,
+        "types": types,
+        "total": total,
+        "missing": missing[missing > 0],
+        "statistics": describe_table(summaries),
+    }
+
 
-def describe_data(df):
-    """Affiche des informations de base sur les données"""
-    st.write(f"Dimensions: {df.shape[0]} lignes, {df.shape[1]} colonnes")
+def describe_data(df, statistics=False):
+    """
+    Affiche des informations de base sur les données
+    (et le tableau de `describe()` si `statistics` est vrai)
+    """
+    with span("describe", rows=len(df)):
+        description = get_description(dataset_id(df), df)
+    st.write(f"Dimensions: {description['shape'][0]} lignes, {description['shape'][1]} colonnes")
     
-    # Types de données
+    # Types de données et mémoire par colonne
     st.write("Types de données:")
-    st.write(df.dtypes)
+    st.write(description["types"])
+    if description["total"]:
+        st.write(description["total"])
     
     # Valeurs manquantes
-    missing = df.isna().sum()
-    if missing.sum() > 0:
+    if len(description["missing"]) > 0:
         st.write("Valeurs manquantes:")
-        st.write(missing[missing > 0])
+        st.write(description["missing"])
+    
+    if statistics:
+        st.dataframe(description["statistics"])
 
 
 def prepare_dataframe_for_display(df):
     """
     Prépare un DataFrame pour l'affichage dans Streamlit en corrigeant
     les problèmes de compatibilité avec Arrow.
+    Les données normalisées au chargement sont retournées sans copie.
     """
-    if df is None:
-        return None
-        
-    # Créer une copie pour éviter de modifier l'original
-    display_df = df.copy()
-    
-    # Convertir explicitement les colonnes problématiques
-    for col in display_df.columns:
-        # Vérifier si le type est Int64, Int32, etc. (nullable integer types)
-        col_type_str = str(display_df[col].dtype)
-        if col_type_str in ['Int64', 'Int32', 'Int16', 'Int8']:
-            # Conversion explicite vers int64 standard
-            display_df[col] = display_df[col].astype('int64')
-        elif col_type_str in ['Float64', 'Float32']:
-            # Conversion explicite vers float64 standard
-            display_df[col] = display_df[col].astype('float64')
-        
-        # Gérer les types object qui pourraient causer des problèmes
-        elif display_df[col].dtype == 'object':
-            # Essayez de convertir en string si possible
-            try:
-                display_df[col] = display_df[col].astype('str')
-            except:
-                pass
-    
-    return display_df
+    with span("prepare_dataframe_for_display", rows=None if df is None else len(df)):
+        return ensure_normalized(df)
 
 
-def add_logo():
-    """Ajoute le logo et le titre au-dessus du menu de navigation dans la sidebar"""
-    import base64
-    
-    logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "images", "logo.png")
-    
-    if os.path.exists(logo_path):
-        # Convertir l'image en base64
-        with open(logo_path, "rb") as f:
-            data = f.read()
-        encoded = base64.b64encode(data).decode()
-        
-        st.markdown(
-            f"""
-            <style>
-                [data-testid="stSidebarNav"] {{
-                    background-image: url(data:image/png;base64,{encoded});
-                    background-repeat: no-repeat;
-                    padding-top: 240px;
-                    background-position: center 20px;
-                    background-size: 150px;
-                }}
-                [data-testid="stSidebarNav"]::before {{
-                    content: "Streamlit App Template";
-                    display: block;
-                    text-align: center;
-                    font-family: var(--font-title);
-                    font-weight: 600;
-                    color: var(--text-primary);
-                    font-size: 1.5rem;
-                    margin-top: 10px;
-                    margin-bottom: 10px;
-                    background: linear-gradient(135deg, #9A6BFF 0%, #F254A4 100%);
-                    -webkit-background-clip: text;
-                    -webkit-text-fill-color: transparent;
-                    background-clip: text;
-                }}
-            </style>
-            """,
-            unsafe_allow_html=True,
+# Tailles de page proposées pour les tableaux paginés
+PAGE_SIZES = (25, 50, 100, 500)
+
+
+def _sort_order(df, sort_col, ascending):
+    """
+    Positions de toutes les lignes dans l'ordre de `sort_col`, départagées par
+    leur position (tri stable) et valeurs manquantes en fin, comme sort_values.
+    Calculé une fois par (dataset, colonne, sens) et partagé dans le registre.
+    """
+    def build():
+        series = df[sort_col].reset_index(drop=True)
+        order = series.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+        order = order.astype(np.int32 if len(order) < np.iinfo(np.int32).max else np.int64)
+        order.flags.writeable = False
+        return order
+
+    return dataset_store.derived(dataset_id(df), ("order", sort_col, ascending), build)
+
+
+def sort_page(df, start, stop, sort_col=None, ascending=True, mask=None):
+    """
+    Retourne les lignes [start, stop) du DataFrame trié par `sort_col`, parmi les
+    lignes sélectionnées par `mask` (masque booléen des filtres, toutes si None).
+    L'ordre complet est calculé une fois par colonne et par sens (ordre total:
+    les égalités sont départagées par la position), puis découpé page par page:
+    les pages mises bout à bout donnent exactement df.sort_values(kind="stable").
+    """
+    if sort_col is None:
+        if mask is None:
+            return df.iloc[start:stop]
+        return df.iloc[np.flatnonzero(mask)[start:stop]]
+
+    order = _sort_order(df, sort_col, ascending)
+    if mask is not None:
+        order = order[mask[order]]
+    return df.iloc[order[start:stop]]
+
+
+def paginated_dataframe(n_rows, columns, fetch_page, key, page_size=50):
+    """
+    Affiche un tableau page par page avec tri côté serveur.
+    `fetch_page(start, stop, sort_col, ascending)` retourne les lignes de la page:
+    seule la page affichée est sérialisée et envoyée au navigateur.
+    """
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_col = st.selectbox(
+            "Trier par",
+            [None] + list(columns),
+            format_func=lambda col: "Ordre d'origine" if col is None else col,
+            key=f"{key}_sort"
         )
-    else:
-        # Si pas de logo, afficher seulement le titre
-        st.markdown(
-            """
-            <style>
-                [data-testid="stSidebarNav"] {
-                    padding-top: 80px;
-                }
-                [data-testid="stSidebarNav"]::before {
-                    content: "Streamlit App Template";
-                    display: block;
-                    text-align: center;
-                    font-family: var(--font-title);
-                    font-weight: 600;
-                    color: var(--text-primary);
-                    font-size: 1.5rem;
-                    margin-top: 20px;
-                    margin-bottom: 10px;
-                    background: linear-gradient(135deg, #9A6BFF 0%, #F254A4 100%);
-                    -webkit-background-clip: text;
-                    -webkit-text-fill-color: transparent;
-                    background-clip: text;
-                }
-            </style>
-            """,
-            unsafe_allow_html=True,
+    with col2:
+        ascending = st.selectbox(
+            "Ordre", ["Croissant", "Décroissant"], key=f"{key}_order"
+        ) == "Croissant"
+    with col3:
+        page_size = st.selectbox(
+            "Lignes par page",
+            PAGE_SIZES,
+            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 0,
+            key=f"{key}_page_size"
         )
+
+    n_pages = max(1, -(-n_rows // page_size))
+    # La page est pilotée par la session (sans valeur par défaut du widget):
+    # revenir à la première page si les filtres ont réduit le nombre de pages
+    if st.session_state.get(f"{key}_page", n_pages + 1) > n_pages:
+        st.session_state[f"{key}_page"] = 1
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, key=f"{key}_page")
+
+    start = (page - 1) * page_size
+    stop = min(start + page_size, n_rows)
+    st.caption(f"Lignes {start + 1:,} à {stop:,} sur {n_rows:,} (page {page}/{n_pages})")
+    page_df = prepare_dataframe_for_display(fetch_page(start, stop, sort_col, ascending))
+    # Sérialisation Arrow de la page envoyée au navigateur
+    with span("st.dataframe", rows=len(page_df)):
+        st.dataframe(page_df)
@@ -1,41 +1,94 @@
-import streamlit as st
-import pandas as pd
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
+import streamlit as st
+from data_loader import dataset_id, ensure_normalized
+from downsampling import (
+    MAX_LINE_POINTS,
+    MAX_SCATTER_POINTS,
+    MAX_SCATTERGL_POINTS,
+    density_grid,
+    downsample_line,
+    finite_xy,
+)
+from summaries import describe_table, get_summary
+from tracing import span, traced
+
 
 def clean_dataframe_for_plotly(df):
-    """Nettoie un DataFrame pour qu'il soit compatible avec Plotly"""
-    if df is None:
-        return None
-    
-    # Créer une copie pour éviter de modifier l'original
-    clean_df = df.copy()
-    
-    # Convertir les types nullable pandas vers des types standard
-    for col in clean_df.columns:
-        col_type_str = str(clean_df[col].dtype)
-        if col_type_str in ['Int64', 'Int32', 'Int16', 'Int8']:
-            clean_df[col] = clean_df[col].astype('int64')
-        elif col_type_str in ['Float64', 'Float32']:
-            clean_df[col] = clean_df[col].astype('float64')
-        elif clean_df[col].dtype == 'object':
-            try:
-                clean_df[col] = clean_df[col].astype('str')
-            except:
-                pass
-    
-    return clean_df
+    """
+    Nettoie un DataFrame pour qu'il soit compatible avec Plotly.
+    Les données normalisées au chargement sont retournées sans copie.
+    """
+    with span("clean_dataframe_for_plotly", rows=None if df is None else len(df)):
+        return ensure_normalized(df)
+
+@traced("figure.line")
+def line_figure(x, y, title, x_label, y_label):
+    """
+    Crée une courbe Plotly dont le nombre de points est borné (LTTB).
+    Retourne la figure et un message si les données ont été réduites, sinon None.
+    """
+    n_points = len(y)
+    x, y, reduced = downsample_line(x, y, MAX_LINE_POINTS)
+    fig = go.Figure(go.Scatter(x=x, y=y, mode="lines"))
+    fig.update_layout(title=title, template="plotly_white", xaxis_title=x_label, yaxis_title=y_label)
+
+    note = None
+    if reduced:
+        note = f"Courbe sous-échantillonnée (LTTB): {len(y):,} points affichés sur {n_points:,}"
+    return fig, note
+
+@traced("figure.scatter")
+def scatter_figure(x, y, title, x_label, y_label):
+    """
+    Crée un nuage de points Plotly dont la taille reste bornée:
+    rendu SVG pour les petits volumes, WebGL au-delà de MAX_SCATTER_POINTS,
+    carte de densité (histogramme 2D) au-delà de MAX_SCATTERGL_POINTS.
+    Retourne la figure et un message si le rendu a été adapté, sinon None.
+    """
+    x, y = finite_xy(x, y)
+    n_points = len(x)
+    note = None
+
+    if n_points <= MAX_SCATTER_POINTS:
+        fig = go.Figure(go.Scatter(x=x, y=y, mode="markers"))
+    elif n_points <= MAX_SCATTERGL_POINTS:
+        fig = go.Figure(go.Scattergl(x=x, y=y, mode="markers", marker=dict(size=3)))
+        note = f"Rendu WebGL: {n_points:,} points"
+    else:
+        x_centers, y_centers, counts = density_grid(x, y)
+        # Les cases vides restent transparentes
+        z = np.where(counts > 0, counts, np.nan)
+        fig = go.Figure(go.Heatmap(
+            x=x_centers, y=y_centers, z=z,
+            colorscale="Viridis", colorbar=dict(title="Points"),
+        ))
+        note = f"Carte de densité: {n_points:,} points regroupés en {counts.shape[1]}×{counts.shape[0]} cases"
+
+    fig.update_layout(title=title, template="plotly_white", xaxis_title=x_label, yaxis_title=y_label)
+    return fig, note
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_line_figure(dataset_key, column, _x, _y, title, x_label, y_label):
+    """Courbe d'une colonne, mise en cache par (dataset, colonne): la réduction LTTB n'est faite qu'une fois"""
+    return line_figure(_x, _y, title, x_label, y_label)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_scatter_figure(dataset_key, x_column, y_column, _x, _y, title, x_label, y_label):
+    """Nuage de points de deux colonnes, mis en cache par (dataset, colonnes)"""
+    return scatter_figure(_x, _y, title, x_label, y_label)
 
 def plot_simple_chart(df):
     """
     Crée une visualisation simple des données avec Plotly
     """
-    # Nettoyer le DataFrame pour Plotly
+    # Nettoyer le DataFrame pour Plotly (l'identifiant du jeu de données sert de clé de cache)
+    dataset_key = dataset_id(df)
     df = clean_dataframe_for_plotly(df)
-    
+
     # Sélectionner colonnes numériques
-    numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns
-    
+    numeric_cols = df.select_dtypes(include="number").columns
+
     if len(numeric_cols) >= 2:
         # Sélecteurs en haut, partagés
         col1, col2 = st.columns(2)
@@ -43,24 +96,19 @@ def plot_simple_chart(df):
             x = st.selectbox("Axe X", numeric_cols, index=0)
         with col2:
             y = st.selectbox("Axe Y", numeric_cols, index=min(1, len(numeric_cols)-1))
-        
+
         # Vérifier que x et y sont différents
         if x == y:
             st.warning("⚠️ Veuillez sélectionner des axes différents pour créer un graphique significatif.")
             return
-        
+
         # Graphique en pleine largeur
         st.markdown("**Graphique**")
-        
-        # Créer le graphique scatter avec Plotly
-        fig = px.scatter(
-            df, 
-            x=x, 
-            y=y,
-            title=f"{y} vs {x}",
-            template="plotly_white"
-        )
-        
+
+        # Créer le graphique scatter avec Plotly (taille bornée quel que soit le volume),
+        # mis en cache par (dataset, colonnes) comme dans le Visualiser
+        fig, note = get_scatter_figure(dataset_key, x, y, df[x], df[y], f"{y} vs {x}", x, y)
+
         # Personnaliser le graphique
         fig.update_layout(
             height=500,
@@ -68,11 +116,15 @@ def plot_simple_chart(df):
             title_font_size=16,
             title_x=0.5
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
+
+        # Sérialisation de la figure envoyée au navigateur
+        with span("st.plotly_chart"):
+            st.plotly_chart(fig, use_container_width=True)
+        if note:
+            st.caption(note)
+
         # Statistiques sous le graphique
         st.markdown("**Statistiques**")
-        st.dataframe(df[[x, y]].describe())
+        st.dataframe(describe_table(get_summary(dataset_id(df), df), [x, y]))
     else:
         st.warning("Pas assez de colonnes numériques pour créer un graphique")
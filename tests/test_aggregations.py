@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+from aggregations import HISTOGRAM_BIN_RULES, MAX_HISTOGRAM_BINS, histogram  # noqa: E402
+
+rng = np.random.default_rng(0)
+VALUES = rng.normal(50, 10, 20_000)
+
+
+@pytest.mark.parametrize("rule", HISTOGRAM_BIN_RULES.values())
+def test_histogram_matches_numpy(rule):
+    counts, edges = histogram(VALUES, rule)
+    expected_counts, expected_edges = np.histogram(VALUES, bins=rule)
+    np.testing.assert_array_equal(counts, expected_counts)
+    np.testing.assert_allclose(edges, expected_edges)
+
+
+@pytest.mark.parametrize("rule", HISTOGRAM_BIN_RULES.values())
+def test_histogram_caps_bins_before_building_edges(rule):
+    values = np.append(rng.normal(size=100_000), 1e9)
+    counts, edges = histogram(values, rule)
+    assert len(counts) <= MAX_HISTOGRAM_BINS
+    assert counts.sum() == len(values)
+    assert edges[0] == values.min() and edges[-1] == 1e9
+
+
+def test_histogram_of_constant_values():
+    counts, _ = histogram(np.full(10, 3.0), "fd")
+    assert counts.tolist() == [10]
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+from datetime import date  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+from catalog import build_catalog  # noqa: E402
+from cube import build_cube, cube_aggregates  # noqa: E402
+from data_loader import normalize_dtypes, optimize_dtypes  # noqa: E402
+from synthetic import generate  # noqa: E402
+
+rng = np.random.default_rng(0)
+df = optimize_dtypes(normalize_dtypes(generate(5_000, end_date=date(2024, 12, 31))))
+df["category"] = df["category"].mask(rng.random(len(df)) < 0.05)
+df["discount_rate"] = df["discount_rate"].mask(rng.random(len(df)) < 0.1)
+catalog = build_catalog(df)
+cube = build_cube(df, catalog)
+
+AGGREGATES = [
+    ("rows", "count", None),
+    ("discounts", "count", "discount_rate"),
+    ("sales", "sum", "total_sales"),
+    ("discount", "avg", "discount_rate"),
+    ("spread", "stddev", "price"),
+]
+
+
+@pytest.mark.parametrize("predicates", [
+    [],
+    [("isin", "category", ("Books", "Toys"))],
+    [("isin", "category", ("Sports", np.nan))],
+    [("isin", "category", ())],
+    [("isin", "month", (1, 2, 3)), ("isin", "is_premium", (True,))],
+    [("isin", "region", ("Europe", "Asia")), ("isin", "region", ("Asia", "Africa"))],
+    [("isin", "quantity", (1,)), ("isin", "is_weekend", (False,)), ("isin", "month", (12,))],
+])
+def test_cube_aggregates_match_pandas(predicates):
+    mask = np.ones(len(df), dtype=bool)
+    for _, column, values in predicates:
+        mask &= df[column].isin(values).to_numpy()
+    rows = df[mask]
+
+    result = cube_aggregates(cube, predicates, AGGREGATES)
+    assert result["rows"] == len(rows)
+    assert result["discounts"] == rows["discount_rate"].count()
+    np.testing.assert_allclose(result["sales"], rows["total_sales"].sum())
+    np.testing.assert_allclose(result["discount"], rows["discount_rate"].mean())
+    np.testing.assert_allclose(result["spread"], rows["price"].std())
+
+
+@pytest.mark.parametrize("predicates, aggregates", [
+    ([("range", "price", (10.0, 50.0))], AGGREGATES),
+    ([("isin", "price", (10.0,))], AGGREGATES),
+    ([], [("sales", "median", "total_sales")]),
+    ([], [("sales", "sum", "category")]),
+])
+def test_cube_aggregates_skip_uncovered_queries(predicates, aggregates):
+    assert cube_aggregates(cube, predicates, aggregates) is None
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+# Dossier de déchargement isolé (le registre le vide à sa création)
+os.environ.setdefault("DATASET_SPILL_DIR", tempfile.mkdtemp(prefix="spill-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+import dataset_store  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from catalog import build_catalog  # noqa: E402
+
+
+def test_write_through_get_does_not_reach_registry():
+    handle = dataset_store.acquire("test:copy-on-write", lambda: pd.DataFrame({"val": [1.0, 2.0, 3.0]}))
+    try:
+        session_df = dataset_store.get(handle)
+        session_df.loc[0, "val"] = 999
+        session_df["val"] += 1
+
+        shared = dataset_store.get(handle)
+        assert shared["val"].tolist() == [1.0, 2.0, 3.0]
+        assert build_catalog(shared)["val"]["max"] == 3.0
+    finally:
+        handle.close()
+
+
+def test_derived_structures_count_against_budget(monkeypatch):
+    monkeypatch.setattr(dataset_store, "MEMORY_BUDGET_BYTES", 1500)
+    dataset_store.clear_derived()
+    first = dataset_store.derived("test:budget", "first", lambda: np.zeros(1000, dtype=np.uint8))
+    assert dataset_store.derived("test:budget", "first", lambda: None) is first
+
+    dataset_store.derived("test:budget", "second", lambda: np.zeros(1000, dtype=np.uint8))
+    assert dataset_store.store_stats()["derived_bytes"] == 1000
+    # La structure la moins récemment utilisée a été libérée: elle est reconstruite
+    assert dataset_store.derived("test:budget", "first", lambda: "rebuilt") == "rebuilt"
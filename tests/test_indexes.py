@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+from indexes import build_sorted_index, build_value_index, isin_mask, range_mask  # noqa: E402
+
+N_ROWS = 5_000
+rng = np.random.default_rng(0)
+
+PRICES = pd.Series(np.round(rng.uniform(0, 100, N_ROWS), 1))
+PRICES[rng.random(N_ROWS) < 0.05] = np.nan
+QUANTITIES = pd.Series(rng.integers(1, 21, N_ROWS).astype(np.int8))
+DATES = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 366 * 24, N_ROWS), unit="h"))
+DATES[rng.random(N_ROWS) < 0.05] = pd.NaT
+CATEGORIES = pd.Series(pd.Categorical(rng.choice(["Books", "Toys", "Sports", None], N_ROWS)))
+
+
+@pytest.mark.parametrize("series, low, high", [
+    (PRICES, 10.0, 12.0),
+    (PRICES, 50.05, 50.15),
+    (QUANTITIES, 1.5, 2.0),
+    (QUANTITIES, 3.0, 3.0),
+])
+def test_range_mask_matches_pandas(series, low, high):
+    mask = range_mask(build_sorted_index(series), len(series), low, high)
+    expected = ((series >= low) & (series <= high)).to_numpy()
+    assert mask is not None
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_date_range_mask_matches_pandas():
+    start, end = pd.Timestamp("2024-03-01"), pd.Timestamp("2024-03-15")
+    mask = range_mask(build_sorted_index(DATES), len(DATES), start, end, high_inclusive=False)
+    expected = ((DATES >= start) & (DATES < end)).to_numpy()
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_range_mask_falls_back_on_wide_ranges():
+    assert range_mask(build_sorted_index(PRICES), len(PRICES), 0.0, 100.0) is None
+
+
+@pytest.mark.parametrize("series, selected", [
+    (CATEGORIES, ("Books", "Toys")),
+    (CATEGORIES, ("Sports", np.nan)),
+    (CATEGORIES, ()),
+    (QUANTITIES, (1, 4, 25)),
+])
+def test_isin_mask_matches_pandas(series, selected):
+    mask = isin_mask(build_value_index(series), len(series), selected)
+    np.testing.assert_array_equal(mask, series.isin(selected).to_numpy())
+
+
+def test_value_index_skips_varied_columns():
+    assert build_value_index(PRICES) is None
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATASET_SPILL_DIR", tempfile.mkdtemp(prefix="spill-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app"))
+
+from datetime import date  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+from data_loader import DATASET_ID_ATTR, normalize_dtypes, optimize_dtypes  # noqa: E402
+from synthetic import generate  # noqa: E402
+from utils import sort_page  # noqa: E402
+
+PAGE_SIZE = 50
+
+df = optimize_dtypes(normalize_dtypes(generate(5_000, end_date=date(2024, 12, 31))))
+df["discount_rate"] = df["discount_rate"].mask(np.random.default_rng(0).random(len(df)) < 0.1)
+df.attrs[DATASET_ID_ATTR] = "test:sort_page"
+
+
+def joined_pages(sort_col, ascending, mask=None):
+    n_rows = len(df) if mask is None else int(mask.sum())
+    pages = [
+        sort_page(df, start, min(start + PAGE_SIZE, n_rows), sort_col, ascending, mask)
+        for start in range(0, n_rows, PAGE_SIZE)
+    ]
+    return pd.concat(pages)
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("sort_col", ["quantity", "month", "category", "price", "date", "discount_rate"])
+def test_pages_match_stable_sort(sort_col, ascending):
+    expected = df.sort_values(sort_col, ascending=ascending, kind="stable")
+    pd.testing.assert_frame_equal(joined_pages(sort_col, ascending), expected)
+
+
+@pytest.mark.parametrize("sort_col", [None, "quantity", "discount_rate"])
+def test_pages_of_filtered_rows(sort_col):
+    mask = (df["category"] == "Books").to_numpy()
+    expected = df[mask]
+    if sort_col is not None:
+        expected = expected.sort_values(sort_col, ascending=False, kind="stable")
+    pd.testing.assert_frame_equal(joined_pages(sort_col, False, mask), expected)